@@ -0,0 +1,154 @@
+"""
+Throughput benchmark for the chat endpoints of server.py and server_async.py.
+
+Starts a stub OpenAI-compatible LLM server that answers every /chat/completions
+call after a fixed delay, then fires concurrent /api/chat requests at the server
+under test and reports requests/s and latency percentiles.
+
+1) Start the stub (it keeps running until Ctrl+C):
+    python benchmarks/bench_server.py stub --port 8088 --delay 1.0
+
+2) Start the server under test against the stub, e.g.
+    GWDG_API_BASE=http://127.0.0.1:8088 CHAT_PIPELINE=speculative python server.py
+    GWDG_API_BASE=http://127.0.0.1:8088 CHAT_PIPELINE=speculative hypercorn server_async:app --bind 127.0.0.1:5001
+
+3) Run the load:
+    python benchmarks/bench_server.py load --url http://127.0.0.1:5001/api/chat --requests 200 --concurrency 32
+
+Every request opens its own conversation (a numbered greeting before the prompt),
+so the semantic response cache never answers and the full pipeline is measured.
+To measure with the cache as deployed, pass --repeat (same prompt and history on
+every request); to rule it out entirely, start the server with CHAT_CACHE_SIZE=0.
+"""
+import argparse, asyncio, json, statistics, time
+
+from aiohttp import web, ClientSession, ClientTimeout
+
+
+STUB_REPLY = "Ich bin die Lahn. Heute fließe ich ruhig und klar durch Gießen."
+
+PROMPTS = [
+    "Wie geht es dir?",
+    "Wie warm ist dein Wasser heute?",
+    "Welche Fische leben in dir?",
+    "Wo entspringst du?",
+    "Was hältst du von den Wehren in Gießen?",
+    "Wie war der Pegel letzte Woche?",
+]
+
+
+async def stub_chat_completions(request):
+    body = await request.json()
+    await asyncio.sleep(request.app["delay"])
+
+    if not body.get("stream"):
+        return web.json_response({
+            "id": "stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": STUB_REPLY}}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        })
+
+    response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+    await response.prepare(request)
+    for word in STUB_REPLY.split(" "):
+        chunk = {
+            "id": "stub",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}],
+        }
+        await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        await asyncio.sleep(request.app["token_delay"])
+    await response.write(b"data: [DONE]\n\n")
+    await response.write_eof()
+    return response
+
+
+def run_stub(args):
+    app = web.Application()
+    app["delay"] = args.delay
+    app["token_delay"] = args.token_delay
+    app.router.add_post("/chat/completions", stub_chat_completions)
+    app.router.add_post("/v1/chat/completions", stub_chat_completions)
+    print(f"Stub LLM on http://127.0.0.1:{args.port} (delay {args.delay}s)")
+    web.run_app(app, host="127.0.0.1", port=args.port, print=None)
+
+
+def load_payload(i, repeat=False):
+    if repeat:
+        return {"prompt": PROMPTS[0], "history": [{"sender": "user", "text": PROMPTS[0]}]}
+    prompt = PROMPTS[i % len(PROMPTS)]
+    # The numbered opening makes the cache key of every request unique
+    return {"prompt": prompt, "history": [
+        {"sender": "user", "text": f"Hallo, ich bin Besucher Nummer {i}."},
+        {"sender": "avatar", "text": STUB_REPLY},
+        {"sender": "user", "text": prompt},
+    ]}
+
+
+async def run_load(args):
+    latencies, errors = [], 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async with ClientSession(timeout=ClientTimeout(total=args.timeout)) as session:
+        async def one(i):
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    async with session.post(args.url, json=load_payload(i, args.repeat), ssl=False) as resp:
+                        await resp.read()
+                        if resp.status != 200:
+                            errors += 1
+                            return
+                except Exception:
+                    errors += 1
+                    return
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(args.requests)))
+        elapsed = time.perf_counter() - start
+
+    print(f"URL:          {args.url}")
+    print(f"Requests:     {args.requests} ({errors} failed), concurrency {args.concurrency}"
+          + (", repeated prompt" if args.repeat else ""))
+    print(f"Wall time:    {elapsed:.2f} s")
+    print(f"Throughput:   {len(latencies) / elapsed:.2f} req/s")
+    if latencies:
+        latencies.sort()
+        print(f"Latency p50:  {statistics.median(latencies) * 1000:.0f} ms")
+        print(f"Latency p95:  {latencies[int(len(latencies) * 0.95) - 1] * 1000:.0f} ms")
+        print(f"Latency max:  {latencies[-1] * 1000:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    stub = sub.add_parser("stub", help="run the stub LLM server")
+    stub.add_argument("--port", type=int, default=8088)
+    stub.add_argument("--delay", type=float, default=1.0, help="seconds before each completion starts")
+    stub.add_argument("--token-delay", type=float, default=0.02, help="seconds between streamed tokens")
+
+    load = sub.add_parser("load", help="fire concurrent chat requests")
+    load.add_argument("--url", default="http://127.0.0.1:5001/api/chat")
+    load.add_argument("--requests", type=int, default=200)
+    load.add_argument("--concurrency", type=int, default=32)
+    load.add_argument("--timeout", type=float, default=120)
+    load.add_argument("--repeat", action="store_true", help="send the same prompt and history every time (cache hits)")
+
+    args = parser.parse_args()
+    if args.command == "stub":
+        run_stub(args)
+    else:
+        asyncio.run(run_load(args))
+
+
+if __name__ == "__main__":
+    main()
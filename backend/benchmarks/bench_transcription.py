@@ -0,0 +1,119 @@
+"""
+Compares transcription backends on a fixture set of German clips.
+
+The fixture directory holds audio clips (wav/webm/ogg/mp3/m4a) and, next to each
+clip, a reference transcript with the same name and a .txt extension:
+
+    fixtures/
+        wasserqualitaet.webm
+        wasserqualitaet.txt
+        ...
+
+For every backend this reports the real-time factor (processing time / audio
+duration, lower is better) and the word error rate against the references.
+'current' is the original path: transformers in fp32 with language detection.
+
+    python benchmarks/bench_transcription.py --clips benchmarks/fixtures \
+        --backends current,transformers,transformers-int8,ctranslate2
+"""
+import argparse, os, re, subprocess, sys, time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.transcription import load_transcriber, TARGET_SR  # noqa: E402
+
+
+AUDIO_EXTENSIONS = (".wav", ".webm", ".ogg", ".mp3", ".m4a", ".flac")
+
+
+def load_clip(path):
+    """Decodes any clip to 16 kHz mono float32 with ffmpeg."""
+    raw = subprocess.run(
+        ["ffmpeg", "-nostdin", "-i", path, "-f", "s16le", "-ac", "1", "-ar", str(TARGET_SR), "-"],
+        check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+    ).stdout
+    return np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def normalize(text):
+    return re.sub(r"[^\w\s]", "", text.lower()).split()
+
+
+def word_errors(reference, hypothesis):
+    """Levenshtein distance between two word lists."""
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hypothesis, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word),
+            ))
+        previous = current
+    return previous[-1]
+
+
+def load_fixtures(directory):
+    fixtures = []
+    for name in sorted(os.listdir(directory)):
+        base, ext = os.path.splitext(name)
+        reference_path = os.path.join(directory, base + ".txt")
+        if ext.lower() in AUDIO_EXTENSIONS and os.path.exists(reference_path):
+            with open(reference_path, encoding="utf-8") as f:
+                fixtures.append((name, load_clip(os.path.join(directory, name)), f.read().strip()))
+    return fixtures
+
+
+def run_backend(backend, fixtures, warmup=True):
+    if backend == "current":
+        transcriber = load_transcriber("transformers", language=None)
+    else:
+        transcriber = load_transcriber(backend)
+
+    if warmup:
+        transcriber.transcribe(fixtures[0][1])
+
+    audio_seconds = processing_seconds = 0.0
+    errors = reference_words = 0
+    for name, audio, reference in fixtures:
+        start = time.perf_counter()
+        hypothesis = transcriber.transcribe(audio)
+        processing_seconds += time.perf_counter() - start
+        audio_seconds += len(audio) / TARGET_SR
+
+        ref_words = normalize(reference)
+        errors += word_errors(ref_words, normalize(hypothesis))
+        reference_words += len(ref_words)
+        print(f"  [{backend}] {name}: {hypothesis}")
+
+    return processing_seconds / audio_seconds, errors / max(reference_words, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clips", required=True, help="directory with clips and .txt references")
+    parser.add_argument("--backends", default="current,transformers,transformers-int8,ctranslate2")
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.clips)
+    if not fixtures:
+        sys.exit(f"No clip/reference pairs found in {args.clips}")
+    total = sum(len(a) for _, a, _ in fixtures) / TARGET_SR
+    print(f"{len(fixtures)} clips, {total:.1f} s of audio\n")
+
+    results = {}
+    for backend in args.backends.split(","):
+        try:
+            results[backend] = run_backend(backend, fixtures)
+        except ImportError as e:
+            print(f"Skipping {backend}: {e}")
+
+    print(f"\n{'backend':<20}{'RTF':>8}{'WER':>8}")
+    for backend, (rtf, wer) in results.items():
+        print(f"{backend:<20}{rtf:>8.3f}{wer * 100:>7.1f}%")
+
+
+if __name__ == "__main__":
+    main()
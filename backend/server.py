@@ -1,14 +1,23 @@
-from flask import Flask, request, jsonify, send_file, make_response
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
-import os, io, asyncio
+import os, json, hashlib, base64
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-# from llama_index.core import Settings
+from llama_index.core import Settings
 from llama_index.core.tools.query_engine import QueryEngineTool
 
-from utils.avatar import get_llm, build_index, build_or_load_index, fetch_system_prompt_from_gdoc
-from utils.utils import whisper_processor, whisper_model, transcribe_audio, azure_speech_response_func, LahnSensorsTool
+from utils.avatar import get_llm, build_index, build_or_load_index, fetch_system_prompt_from_gdoc, format_retrieved_context, load_embed_model
+from utils.utils import get_transcriber, azure_speech_response_func, azure_speech_stream, realtime_pool, OUTPUT_SAMPLERATE, LahnSensorsTool, sensor_cache, format_history_as_string
+from utils.response_cache import SemanticResponseCache
+from utils.startup import StartupLoader, NotReady
+from utils.transcription_jobs import transcription_queue
+from utils.reply_audio import reply_audio_store
+from utils.prompt_store import system_prompt_store
+from utils.history import HistoryManager
+from utils.sessions import session_store, SessionExpired
+import queue
 
 import os
 
@@ -18,6 +27,7 @@ CORS(app, supports_credentials=True)
 
 UPLOAD_DIR = "data/uploaded_experiences"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
+REPLY_AUDIO_URL = "https://lahn-server.eastus.cloudapp.azure.com:5001/api/reply-audio"
 
 # === Load LLM once at startup ===
 llm_choice = "gemma-3-27b-it" #"hrz-chat-small" #"gemma-3-27b-it" #"mistral-large-instruct" #"hrz-chat-small"
@@ -34,6 +44,7 @@ api_tool = QueryEngineTool.from_defaults(
         name=LahnSensorsTool.name,
         description=LahnSensorsTool.description,
     )
+sensor_cache.start()
 
 
 def prepare_query_engine(refresh=False):
@@ -46,11 +57,58 @@ def prepare_query_engine(refresh=False):
     # query_llm = get_llm('gwdg', "mistral-large-instruct", system_prompt= 'Provide an accurate response to the given query:')
 
     index_query_engine = index.as_query_engine(llm=query_llm,similarity_top_k=10)
+    index_retriever = index.as_retriever(similarity_top_k=10)
 
-    return index_query_engine
+    return index_query_engine, index_retriever
 
 
-query_engine = prepare_query_engine()
+# 'synthesize': context is the query engine's LLM summary of the top-k nodes
+# 'retrieve': context is the top-k node texts themselves (no extra LLM call)
+CONTEXT_MODE = os.getenv("CHAT_CONTEXT_MODE", "synthesize")
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CHAT_CONTEXT_TOKEN_BUDGET", "2000"))
+
+query_engine, retriever = None, None
+
+
+def load_index():
+    global query_engine, retriever
+    query_engine, retriever = prepare_query_engine()
+
+
+# 'background': bind right away and load Whisper, the embedder and the index in parallel threads
+# 'blocking': load everything before the server starts
+STARTUP_MODE = os.getenv("STARTUP_MODE", "background")
+STARTUP_WAIT_TIMEOUT = float(os.getenv("STARTUP_WAIT_TIMEOUT", "90"))
+
+startup = StartupLoader()
+startup.add("whisper", get_transcriber)
+startup.add("embedder", load_embed_model)
+startup.add("index", load_index, after=["embedder"])
+startup.start()
+if STARTUP_MODE == 'blocking':
+    for name in startup.components:
+        startup.wait_for(name)
+
+# Uploaded experiences are transcribed in the background, in batches
+transcription_queue.start()
+# Voice turns take pre-warmed realtime sessions from a pool on its own event loop
+realtime_pool.start()
+
+# Replies to short conversations are cached on the prompt embedding (same MiniLM model as the index)
+response_cache = SemanticResponseCache(
+    lambda text: Settings.embed_model.get_query_embedding(text),
+    threshold=float(os.getenv("CHAT_CACHE_THRESHOLD", "0.92")),
+    ttl=float(os.getenv("CHAT_CACHE_TTL", str(6 * 3600))),
+    max_entries=int(os.getenv("CHAT_CACHE_SIZE", "512")),
+)
+CACHE_MAX_HISTORY = int(os.getenv("CHAT_CACHE_MAX_HISTORY", "3"))
+
+# Older turns of long conversations are folded into a rolling summary (by the small model)
+history_manager = HistoryManager(lambda prompt: query_llm.complete(prompt).text)
+
+# Cached replies and warm voice sessions were made with the old prompt
+system_prompt_store.on_change(response_cache.clear)
+system_prompt_store.on_change(realtime_pool.recycle)
 
 debate_summary_llm, _= get_llm('gwdg', "mistral-large-instruct", system_prompt= '')
 print('LLM initialized.')
@@ -58,11 +116,30 @@ print('LLM initialized.')
 
 
 
+@app.route("/api/ready")
+def ready():
+    """Startup state and per-component load times. 503 until everything is loaded."""
+    report = startup.report()
+    return jsonify(report), 200 if report["ready"] else 503
+
+
+
+@app.route("/api/transcription-stats")
+def transcription_stats():
+    """Whisper micro-batching metrics: batch sizes and queue wait times."""
+    transcriber = get_transcriber() if startup.ready(["whisper"]) else None
+    if not hasattr(transcriber, "stats"):
+        return jsonify({"batching": False})
+    return jsonify({"batching": True, **transcriber.stats()})
+
+
+
 @app.route("/api/refresh-prompt", methods=["POST"])
 def refresh_prompt():
     global system_prompt, llm
     print('Refresh prompt request received.')
     fetch_system_prompt_from_gdoc()
+    system_prompt_store.refresh()
     llm,  system_prompt = get_llm('openai', llm_choice)
     return 'Done.'
 
@@ -70,98 +147,292 @@ def refresh_prompt():
 
 @app.route("/api/refresh-embeddings", methods=["POST"])
 def refresh_embeddings():
-    global query_engine
+    global query_engine, retriever
     print('Refresh embeddings request received.')
-    query_engine = prepare_query_engine(refresh=True)
+    try:
+        startup.wait_for("embedder", STARTUP_WAIT_TIMEOUT)
+    except NotReady as e:
+        return not_ready_response(e)
+    query_engine, retriever = prepare_query_engine(refresh=True)
+    response_cache.clear()
     return 'Done'
 
 
 
-@app.route("/api/chat", methods=["POST"])
-def chat():
-    global llm, llm_choice, system_prompt
-    print('Chat request received.')
-    data = request.get_json()
+SENSOR_TOOL_MARKER = 'analyze_sensor_data'
+
+# 'speculative': start retrieval as soon as the request arrives and run a single grounded completion
+# 'legacy': ungrounded completion first, then retrieval, then the grounded completion
+CHAT_PIPELINE = os.getenv("CHAT_PIPELINE", "speculative")
+retrieval_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="retrieval")
+
+
+def not_ready_response(error):
+    # plain dict so that server_async (Quart) can return it as well
+    return {"error": str(error), "startup": startup.report()}, 503
+
+
+def session_expired_response(error):
+    # 410 tells the client to drop its session_id and resend the history with "resume"
+    return {"error": str(error), "session_expired": True}, 410
+
+
+def open_conversation(data):
+    """
+    Resolves the conversation of a chat request. Clients send their session_id
+    (none on the first request) and only the new prompt. Clients that still send
+    the whole "history" are served from it without a session, unless they set
+    "resume" (after a 410), which starts a new session seeded with that history.
+    Returns (session, conversation), the conversation ending with the prompt;
+    session is None for sessionless requests. Nothing is stored until
+    finish_turn(). Raises SessionExpired for an unknown session_id.
+    """
     prompt = data.get("prompt", "")
-    conversation = data.get("history", "")
+    if "history" in data and not data.get("resume"):
+        return None, data.get("history") or []
+    if data.get("resume"):
+        history = list(data.get("history") or [])
+        if history and history[-1]["sender"] == "user" and history[-1]["text"] == prompt:
+            history = history[:-1]
+        session = session_store.new(history)
+    elif data.get("session_id"):
+        session = session_store.get(data["session_id"])
+    else:
+        session = session_store.new()
+    with session.lock:
+        conversation = list(session.messages)
+    if prompt and prompt != "__INIT__":
+        conversation.append({"sender": "user", "text": prompt})
+    return session, conversation
+
+
+def finish_turn(session, prompt, reply):
+    """Adds the prompt and the avatar's reply to the session together. Returns the response payload."""
+    if session is None:
+        return {"reply": reply}
+    session_store.append_turn(session, "" if prompt == "__INIT__" else prompt, reply)
+    return {"reply": reply, "session_id": session.id}
+
+
+def build_chat_history(prompt, conversation, conversation_id=None, session=None):
+    """
+    Turn the client payload into the message list sent to the chat LLM.
+    Long conversations are windowed to the model's token budget, minus what
+    the system prompt already takes.
+    Returns (prompt, chat_history), or (prompt, None) if the prompt is empty.
+    """
     chat_history = []
+    system_prompt = system_prompt_store.get()
 
     if prompt == "__INIT__":
         prompt = "Hallo"
         # chat_history=[{'role':'user', 'content':prompt}]
 
     elif not prompt: #Needed?
-        return jsonify({"reply": "Please say something."}), 400
-
+        return prompt, None
 
     else:
-        chat_history = [
-            {'role':"user" if m["sender"] == "user" else "assistant", 'content':m["text"]}
-            for m in conversation
-            ]
+        if session is not None:
+            # the prompt only joins the session once the reply is done, see finish_turn()
+            with session.lock:
+                chat_history = list(session.chat_messages)
+            chat_history.append({'role': 'user', 'content': prompt})
+            conversation_id = session.id
+        else:
+            chat_history = [
+                {'role':"user" if m["sender"] == "user" else "assistant", 'content':m["text"]}
+                for m in conversation
+                ]
+        chat_history = history_manager.window(chat_history, llm_choice, conversation_id, reserved=system_prompt.token_count)
 
     chat_history.insert(0, {'role':'user', 'content':'Hallo'})
-    chat_history.insert(0, {'role':'system', 'content':system_prompt})
+    chat_history.insert(0, {'role':'system', 'content':system_prompt.text})
+
+    return prompt, chat_history
+
+
+def response_cache_key(prompt, conversation):
+    """
+    The part of the cache key besides the prompt: a hash of the conversation before it.
+    Returns None for conversations too long to be worth caching.
+    """
+    conversation = list(conversation or [])
+    if len(conversation) > CACHE_MAX_HISTORY:
+        return None
+    if conversation and conversation[-1]["sender"] == "user" and conversation[-1]["text"] == prompt:
+        conversation = conversation[:-1]
+    previous = json.dumps([[m["sender"], m["text"]] for m in conversation])
+    return hashlib.sha1(previous.encode()).hexdigest()
+
+
+def start_retrieval(prompt, before_cache=False):
+    """
+    Kicks off the RAG lookup for the prompt in the background, so it runs while
+    the rest of the request is being prepared. With before_cache it only starts
+    in 'retrieve' mode: that lookup calls no LLM and may overlap the response
+    cache check, whereas a 'synthesize' lookup would spend upstream tokens even
+    when the cache answers (a running future can't be cancelled).
+    """
+    if CHAT_PIPELINE != 'speculative' or (before_cache and CONTEXT_MODE != 'retrieve'):
+        return None
+    return retrieval_pool.submit(retrieve_context, prompt)
+
+
+def retrieve_context(query):
+    print('Obtaining information for the LLM...')
+    if CONTEXT_MODE == 'retrieve':
+        context = format_retrieved_context(retriever.retrieve(query), CONTEXT_TOKEN_BUDGET)
+    else:
+        context = query_engine.query(query).response
+    print('Context: ', context)
+    return context
 
-    # print('Chat history: ', chat_history)
 
-    # print('After adding system and user prompts: ', chat_history)
+def ground_chat_history(prompt, chat_history, context_future=None):
+    """
+    Returns the messages for the grounded completion.
+    In 'legacy' mode this first runs the ungrounded completion (whose output is
+    only logged) and then the RAG lookup. In 'speculative' mode the lookup was
+    already started by start_retrieval() and we only wait for it.
+    """
+    print('\nUser message:', prompt)
 
-    # print('Chat history: ', chat_history)
-    # print('model: ', llm_choice)
+    if context_future is not None:
+        context = context_future.result()
+    else:
+        chat_completion = llm.chat.completions.create(
+              messages=chat_history,
+              model= llm_choice,
+              temperature=0.5
+          )
 
+        response = chat_completion.choices[0].message.content
+        print('Response: ', response)
 
+        # if 'get_relevant_Lahn_context' in response:
+        # response = response[response.find('user_query="')+12:]
+        query = prompt #response[:response.find('")')]
+        # print('Query: ', query)
+        context = retrieve_context(query)
+        # results += '\nHere is the output of get_relevant_Lahn_context(): '+context
 
-    chat_completion = llm.chat.completions.create(
-          messages=chat_history,
-          model= llm_choice,
-          temperature=0.5
-      )
+    return add_context(chat_history, context)
 
 
-    print('\nUser message:', prompt)
-    response = chat_completion.choices[0].message.content
-    print('Response: ', response)
+def add_context(chat_history, context):
+    return chat_history+[{'role':'system', 'content':'Here is relevant information about the Lahn: '+context + ' . You can call get_relevant_Lahn_context() if environmental data readings are relevant to the user\'s query.'}]
 
+
+def run_sensor_tool(response):
+    """Runs analyze_sensor_data() if the LLM asked for it. Returns '' otherwise."""
     results = ''
 
-    # if 'get_relevant_Lahn_context' in response:
-    print('Obtaining information for the LLM...')
-    # response = response[response.find('user_query="')+12:]
-    query = prompt #response[:response.find('")')]
-    # print('Query: ', query)
-    context = query_engine.query(query).response
-    print('Context: ', context)
-    # results += '\nHere is the output of get_relevant_Lahn_context(): '+context
+    if SENSOR_TOOL_MARKER in response:
+        print('Analyzing sensor data...')
+        response = response[response.find('user_query="')+12:]
+        query = response[:response.find('")')]
+        print('Query: ', query)
+        analysis = str(api_tool(query))
+        print('Analysis: ', analysis)
+        results += '\nHere is the output of analyze_sensor_data(): '+analysis
 
-    chat_completion = llm.chat.completions.create(
-          messages=chat_history+[{'role':'system', 'content':'Here is relevant information about the Lahn: '+context + ' . You can call get_relevant_Lahn_context() if environmental data readings are relevant to the user\'s query.'}],
+    return results
+
+
+def stream_completion(messages):
+    """Yields the text deltas of a streamed chat completion."""
+    stream = llm.chat.completions.create(
+          messages=messages,
           model= llm_choice,
+          stream=True,
       )
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
 
-    response = chat_completion.choices[0].message.content
 
+class ToolCallFilter:
+    """
+    Decides which streamed text may be forwarded to the client. The last few
+    characters are held back so that a tool call split across chunks never
+    reaches the client; once the marker shows up, nothing more is forwarded.
+    """
 
+    holdback = len(SENSOR_TOOL_MARKER) - 1
 
-    # if 'get_relevant_Lahn_context' in response:
-    #     print('Fetching relevant Lahn context...')
-    #     response = response[response.find('user_query="')+12:]
-    #     query = response[:response.find('")')]
-    #     print('Query: ', query)
-    #     context = query_engine.query(query).response
-    #     print('Context: ', context)
-    #     results += '\nHere is the output of get_relevant_Lahn_context(): '+context
+    def __init__(self):
+        self.response = ''
+        self.sent = 0
+        self.tool_called = False
 
+    def feed(self, delta):
+        """Returns the text that is safe to forward after this delta."""
+        self.response += delta
+        if self.tool_called or SENSOR_TOOL_MARKER in self.response:
+            self.tool_called = True
+            return ''
+        return self._release(len(self.response) - self.holdback)
 
+    def flush(self):
+        """Returns the held back text at the end of the stream."""
+        if self.tool_called:
+            return ''
+        return self._release(len(self.response))
 
-    if 'analyze_sensor_data' in response:
-        print('Analyzing sensor data...')
-        response = response[response.find('user_query="')+12:]
-        query = response[:response.find('")')]
-        print('Query: ', query)
-        analysis = str(api_tool(query))
-        print('Analysis: ', analysis)
-        results += '\nHere is the output of analyze_sensor_data(): '+analysis
+    def _release(self, upto):
+        if upto <= self.sent:
+            return ''
+        text = self.response[self.sent:upto]
+        self.sent = upto
+        return text
+
+
+def sse_event(payload, event=None):
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(payload)}\n\n"
+
+
+
+@app.route("/api/chat", methods=["POST"])
+def chat():
+    print('Chat request received.')
+    try:
+        startup.wait_for("index", STARTUP_WAIT_TIMEOUT)
+    except NotReady as e:
+        return not_ready_response(e)
+    data = request.get_json()
+    try:
+        session, conversation = open_conversation(data)
+    except SessionExpired as e:
+        return session_expired_response(e)
+    prompt, chat_history = build_chat_history(data.get("prompt", ""), conversation, data.get("conversation_id"), session)
+
+    if chat_history is None:
+        return jsonify({"reply": "Please say something."}), 400
+
+    # Only overlaps the cache check in 'retrieve' mode, see start_retrieval()
+    context_future = start_retrieval(prompt, before_cache=True)
+
+    cache_key = response_cache_key(prompt, conversation)
+    if cache_key is not None:
+        cached = response_cache.lookup(prompt, cache_key)
+        if cached is not None:
+            return jsonify(finish_turn(session, data.get("prompt", ""), cached))
+
+    if context_future is None:
+        context_future = start_retrieval(prompt)
+
+    # print('Chat history: ', chat_history)
+    # print('model: ', llm_choice)
+
+    chat_completion = llm.chat.completions.create(
+          messages=ground_chat_history(prompt, chat_history, context_future),
+          model= llm_choice,
+      )
+
+    response = chat_completion.choices[0].message.content
+
+    results = run_sensor_tool(response)
 
     if len(results)>0:
         chat_completion = llm.chat.completions.create(
@@ -173,26 +444,129 @@ def chat():
 
     print('Avatar response:', response)
 
-    return jsonify({"reply": response})
+    # Replies based on live sensor readings go stale, so only cache the others
+    if cache_key is not None and len(results)==0:
+        response_cache.store(prompt, response, cache_key)
 
+    return jsonify(finish_turn(session, data.get("prompt", ""), response))
 
 
-@app.route("/api/debate-summary", methods=["POST"])
-def debate_summary():
-    print('Debate Summary request received.')
+
+@app.route("/api/chat-stream", methods=["POST"])
+def chat_stream():
+    """
+    Same pipeline as /api/chat, but the final completion is streamed to the
+    client as Server-Sent Events:
+        data: {"delta": "..."}          text as it arrives
+        event: reset                    discard the partial text (tool call detected)
+        event: done / data: {"reply"}   the complete reply
+    """
+    print('Chat stream request received.')
+    try:
+        startup.wait_for("index", STARTUP_WAIT_TIMEOUT)
+    except NotReady as e:
+        return not_ready_response(e)
     data = request.get_json()
-    conversation = data.get("history", "")
+    try:
+        session, conversation = open_conversation(data)
+    except SessionExpired as e:
+        return session_expired_response(e)
+    prompt, chat_history = build_chat_history(data.get("prompt", ""), conversation, data.get("conversation_id"), session)
+
+    if chat_history is None:
+        return jsonify({"reply": "Please say something."}), 400
+
+    # Only overlaps the cache check in 'retrieve' mode, see start_retrieval()
+    context_future = start_retrieval(prompt, before_cache=True)
+
+    cache_key = response_cache_key(prompt, conversation)
+    cached = response_cache.lookup(prompt, cache_key) if cache_key is not None else None
+    if cached is not None:
+        return Response(
+            sse_event({"delta": cached}) + sse_event(finish_turn(session, data.get("prompt", ""), cached), event="done"),
+            mimetype="text/event-stream",
+        )
+
+    if context_future is None:
+        context_future = start_retrieval(prompt)
+
+    def generate():
+        grounded_history = ground_chat_history(prompt, chat_history, context_future)
+
+        tool_filter = ToolCallFilter()
+        for delta in stream_completion(grounded_history):
+            text = tool_filter.feed(delta)
+            if text:
+                yield sse_event({"delta": text})
+
+        text = tool_filter.flush()
+        if text:
+            yield sse_event({"delta": text})
+
+        response = tool_filter.response
+        if tool_filter.tool_called:
+            if tool_filter.sent > 0:
+                yield sse_event({}, event="reset")
+            results = run_sensor_tool(response)
+            response = ''
+            for delta in stream_completion(chat_history+[{'role':'system', 'content':results}]):
+                response += delta
+                yield sse_event({"delta": delta})
+
+        print('Avatar response:', response)
+        if cache_key is not None and not tool_filter.tool_called:
+            response_cache.store(prompt, response, cache_key)
+        yield sse_event(finish_turn(session, data.get("prompt", ""), response), event="done")
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+
+def prepare_debate_summary(data):
+    """
+    Builds the summary prompt for a debate-summary request. With a session only
+    the turns that are not folded into the session's summary yet are sent,
+    together with that summary, so the prompt doesn't grow with the debate.
+    Returns (session, prompt, upto, summary); prompt is None if nothing is new.
+    Raises SessionExpired for an unknown session_id.
+    """
     topic = data.get("topic", "")
     summary = data.get("summary", "")
+    if "history" in data:
+        return None, debate_summary_prompt(topic, format_history_as_string(data.get("history") or []), summary), None, summary
+    if not data.get("session_id"):
+        # no conversation yet, nothing to summarise
+        return None, None, None, summary
+
+    session = session_store.get(data["session_id"])
+    with session.lock:
+        upto = len(session.messages)
+        new_turns = session.history_lines[session.summarized_upto:upto]
+        summary = session.debate_summary or summary
+    if not new_turns:
+        return session, None, upto, summary
+    return session, debate_summary_prompt(topic, "\n".join(new_turns), summary, new_turns_only=True), upto, summary
+
+
+def finish_debate_summary(session, summary, upto):
+    if session is not None:
+        session_store.set_debate_summary(session, summary, upto)
+    print('Summary:', summary)
+    return {"summary": summary}
 
-    formatted_history = format_history_as_string(conversation)
 
+def debate_summary_prompt(topic, formatted_history, summary, new_turns_only=False):
+    conversation_label = "New turns since the existing summary" if new_turns_only else "Conversation"
     prompt = f"""This is a debate between a human and an AI avatar for the Lahn river. Your job is to provide a summary outline in the format
             "Lahn:<Lahn's Central Perspective>\nPro:<Central Pro>\nCon:<Central Con of Lahn's perspective (deduced by you)>\n\nYou:<User's Central Perspective>\nPro:<Central Pro>\nCon:<Central Con of User's perspective (deduced by you)>", briefly outlining the Lahn's primary perspective, a pro and con of that perspective, the user's perspective
             and a pro and con of that as well. Keep all content very brief. You're summarizing, not re-iterating. You are provided with the most recent debate summary. If it already contains content, iterate on that content to reflect recent updates to the conversation.
             Topic being debated: {topic}
 
-            Conversation:
+            {conversation_label}:
             {formatted_history}
 
             Existing summary:
@@ -201,6 +575,21 @@ def debate_summary():
             Respond with an updated version of the summary in the described format. Make sure to preserve the specified formatting in the template "Lahn:\nPro:\nCon:\n\nYou:\nPro:\nCon:". No extra characters. The contents of your response should ba based purely on the given summary. 
             Summaries for 'Lahn' and 'User'should be based purely on what they said. If any party is yet to contribute to the conversation, leave their summary blank, as in the template."""
 
+    return prompt
+
+
+
+@app.route("/api/debate-summary", methods=["POST"])
+def debate_summary():
+    print('Debate Summary request received.')
+    data = request.get_json()
+    try:
+        session, prompt, upto, summary = prepare_debate_summary(data)
+    except SessionExpired as e:
+        return session_expired_response(e)
+    if prompt is None:
+        return jsonify({"summary": summary})
+
     response = debate_summary_llm.complete(prompt) #chat_engine.chat(prompt)
     # print('Summary model response: ', response)
     summary = str(response) #.choices[0].message.content
@@ -212,9 +601,8 @@ def debate_summary():
 
     # print('User message:', prompt)
     # response = chat_engine.chat(messages=chat_history)
-    print('Summary:', summary)
 
-    return jsonify({"summary": summary})
+    return jsonify(finish_debate_summary(session, summary, upto))
 
 
 
@@ -223,40 +611,77 @@ def voice_chat():
     if "audio" not in request.files:
         return jsonify({"error": "No audio uploaded"}), 400
 
-    audio_file = request.files["audio"]
-    ext = audio_file.mimetype.split("/")[-1] 
-    audio_path = 'data/temp.'+ext
-    audio_file.save(audio_path)
-
-    # audio_b64 = base64.b64encode(request.files["audio"].read()).decode()
+    audio_bytes = request.files["audio"].read()
+    inline = request.args.get("inline") == "1"
 
     try:
         # run async function to get reply
-        reply_text, reply_wav = asyncio.run(azure_speech_response_func(audio_path))
-        # save reply to disk
-        out_path = os.path.join("data", "reply.wav")
-        with open(out_path, "wb") as f:
-            f.write(reply_wav)
-        return jsonify({
+        reply_text, reply_wav = realtime_pool.run(azure_speech_response_func(audio_bytes))
+        # keep the reply in memory under its own id
+        reply_id = reply_audio_store.put(reply_wav)
+        payload = {
             "reply_text": reply_text,
-            "reply_audio_url": "https://lahn-server.eastus.cloudapp.azure.com:5001/api/reply-audio"
-        })
+            "reply_id": reply_id,
+            "reply_audio_url": f"{REPLY_AUDIO_URL}/{reply_id}",
+        }
+        if inline:
+            payload["reply_audio"] = base64.b64encode(reply_wav).decode()
+        return jsonify(payload)
     except Exception as e:
         print("❌ Voice chat error:", e)
         return jsonify({"error": "Voice chat failed"}), 500
-    finally:
-        os.remove(audio_path)
 
 
 
-@app.route("/api/reply-audio")
-def reply_audio():
-    # Serve the latest reply audio file
-    audio_path = os.path.join("data", "reply.wav")
-    if not os.path.exists(audio_path):
+def voice_stream_events(deltas):
+    """
+    SSE for a spoken reply, relayed as the realtime model produces it:
+        event: audio / data: {"audio", "sample_rate"}   base64 PCM16 chunk
+        data: {"delta": "..."}                          transcript text
+        event: done / data: {"reply"}                   the complete transcript
+    """
+    text_parts = []
+    for kind, delta in deltas:
+        if kind == "text":
+            text_parts.append(delta)
+            yield sse_event({"delta": delta})
+        else:
+            yield sse_event({"audio": base64.b64encode(delta).decode(), "sample_rate": OUTPUT_SAMPLERATE}, event="audio")
+    yield sse_event({"reply": "".join(text_parts)}, event="done")
+
+
+
+@app.route("/api/voice-chat-stream", methods=["POST"])
+def voice_chat_stream():
+    """Like /api/voice-chat, but audio and text are streamed back as Server-Sent Events."""
+    if "audio" not in request.files:
+        return jsonify({"error": "No audio uploaded"}), 400
+
+    audio_bytes = request.files["audio"].read()
+
+    def generate():
+        try:
+            yield from voice_stream_events(realtime_pool.iterate(azure_speech_stream(audio_bytes)))
+        except Exception as e:
+            print("❌ Voice chat error:", e)
+            yield sse_event({"error": "Voice chat failed"}, event="error")
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+
+@app.route("/api/reply-audio/<reply_id>")
+def reply_audio(reply_id):
+    # Serve the reply audio of one voice-chat request
+    entry = reply_audio_store.get(reply_id)
+    if entry is None:
         return "", 404
-    # Create response with CORS headers
-    response = make_response(send_file(audio_path, mimetype="audio/wav"))
+    audio, mimetype = entry
+    response = Response(audio, mimetype=mimetype)
     response.headers["Access-Control-Allow-Origin"] = "*"  # or specify frontend origin
     response.headers["Access-Control-Allow-Headers"] = "Content-Type"
     return response
@@ -275,25 +700,42 @@ def experience_upload():
         with open(os.path.join(UPLOAD_DIR+'/text', f"{timestamp}_message.txt"), "w", encoding="utf-8") as f:
             f.write(text.strip())
 
-    # Save and transcribe the uploaded audio file
+    # Save the uploaded audio file and queue its transcription
     if "audio" in request.files:
         audio_file = request.files["audio"]
         if audio_file and audio_file.filename:
             safe_name = secure_filename(audio_file.filename)
             file_ext = os.path.splitext(safe_name)[1]
             audio_path = os.path.join(UPLOAD_DIR, f"{timestamp}_audio{file_ext}")
-            audio_file.save(audio_path)
+            audio_bytes = audio_file.read()
+            with open(audio_path, "wb") as f:
+                f.write(audio_bytes)
 
             try:
-                transcript = transcribe_audio(audio_path)
-                with open(os.path.join(UPLOAD_DIR+'/text', f"{timestamp}_transcript.txt"), "w", encoding="utf-8") as f:
-                    f.write(transcript.strip())
-                print("📝 Transcription saved.")
-            except Exception as e:
-                print("❌ Failed to transcribe:", e)
-                return jsonify({"status": "error", "message": "Audio saved, but transcription failed."}), 500
+                job_id = transcription_queue.submit(audio_bytes, on_done=transcript_writer(timestamp))
+            except queue.Full:
+                print("❌ Transcription queue full.")
+                return jsonify({"status": "error", "message": "Audio saved, but transcription queue is full."}), 503
+            return jsonify({"status": "success", "message": "Experience saved.", "job_id": job_id}), 202
 
     return jsonify({"status": "success", "message": "Experience saved."})
 
+
+def transcript_writer(timestamp):
+    def write(transcript):
+        with open(os.path.join(UPLOAD_DIR+'/text', f"{timestamp}_transcript.txt"), "w", encoding="utf-8") as f:
+            f.write(transcript.strip())
+        print("📝 Transcription saved.")
+    return write
+
+
+
+@app.route("/api/experience-upload/<job_id>")
+def experience_upload_status(job_id):
+    status = transcription_queue.status(job_id)
+    if status is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(status)
+
 if __name__ == "__main__":
     app.run(debug=True, use_reloader=False)
@@ -19,7 +19,7 @@ from llama_index.core.agent import FunctionCallingAgent
 
 
 from utils.avatar import get_llm, build_index, build_or_load_index, fetch_system_prompt_from_gdoc
-from utils.utils import whisper_processor, whisper_model, transcribe_audio, azure_speech_response_func, format_history_as_string, LahnSensorsTool, NoMemory
+from utils.utils import transcribe_audio, azure_speech_response_func, format_history_as_string, LahnSensorsTool, NoMemory
 
 import os
 
@@ -0,0 +1,386 @@
+"""
+Asyncio-native variant of server.py.
+
+All /api/* routes are served from a single event loop, and the chat LLM is called
+through AsyncOpenAI, so many conversations can wait on the upstream LLM at the same
+time in one process. The models, index and helpers are shared with server.py.
+The duplex voice WebSocket (/api/voice-duplex) is only served here.
+
+Run with:
+    hypercorn server_async:app --bind 0.0.0.0:5001 --certfile ... --keyfile ...
+"""
+from quart import Quart, request, websocket, jsonify, Response
+from quart_cors import cors
+from werkzeug.utils import secure_filename
+from openai import AsyncOpenAI
+import os, asyncio, base64
+from datetime import datetime
+
+import server
+from server import (
+    build_chat_history, retrieve_context, add_context, run_sensor_tool,
+    ToolCallFilter, sse_event, open_conversation, finish_turn, prepare_debate_summary, finish_debate_summary, response_cache, response_cache_key, not_ready_response, session_expired_response,
+    startup, STARTUP_WAIT_TIMEOUT, UPLOAD_DIR, REPLY_AUDIO_URL, transcript_writer,
+)
+from utils.transcription_jobs import transcription_queue
+from utils.transcription import get_transcriber
+from utils.reply_audio import reply_audio_store
+from utils.voice_duplex import DuplexVoiceSession
+import json
+import queue
+from utils.startup import NotReady
+from utils.sessions import SessionExpired
+from utils.avatar import API_KEY, API_BASE
+from utils.utils import azure_speech_response_func, azure_speech_stream, realtime_pool, OUTPUT_SAMPLERATE
+
+
+app = cors(Quart(__name__), allow_origin="*")
+
+# Same endpoint as the sync client from get_llm('openai', ...)
+allm = AsyncOpenAI(api_key=API_KEY, base_url=API_BASE)
+
+
+
+@app.route("/api/ready")
+async def ready():
+    report = startup.report()
+    return jsonify(report), 200 if report["ready"] else 503
+
+
+
+@app.route("/api/transcription-stats")
+async def transcription_stats():
+    """Whisper micro-batching metrics: batch sizes and queue wait times."""
+    transcriber = get_transcriber() if startup.ready(["whisper"]) else None
+    if not hasattr(transcriber, "stats"):
+        return jsonify({"batching": False})
+    return jsonify({"batching": True, **transcriber.stats()})
+
+
+
+@app.route("/api/refresh-prompt", methods=["POST"])
+async def refresh_prompt():
+    return await asyncio.to_thread(server.refresh_prompt)
+
+
+
+@app.route("/api/refresh-embeddings", methods=["POST"])
+async def refresh_embeddings():
+    return await asyncio.to_thread(server.refresh_embeddings)
+
+
+
+def astart_retrieval(prompt, before_cache=False):
+    """
+    Async counterpart of server.start_retrieval(). The lookup itself stays in a
+    worker thread: embedding the query and the vector search are CPU work that
+    would stall every other conversation on the loop.
+    """
+    if server.CHAT_PIPELINE != 'speculative' or (before_cache and server.CONTEXT_MODE != 'retrieve'):
+        return None
+    return asyncio.create_task(asyncio.to_thread(retrieve_context, prompt))
+
+
+async def aground_chat_history(prompt, chat_history, context_task=None):
+    """Async counterpart of server.ground_chat_history()."""
+    print('\nUser message:', prompt)
+
+    if context_task is not None:
+        context = await context_task
+    else:
+        chat_completion = await allm.chat.completions.create(
+              messages=chat_history,
+              model= server.llm_choice,
+              temperature=0.5
+          )
+        print('Response: ', chat_completion.choices[0].message.content)
+        context = await asyncio.to_thread(retrieve_context, prompt)
+
+    return add_context(chat_history, context)
+
+
+async def astream_completion(messages):
+    """Yields the text deltas of a streamed chat completion."""
+    stream = await allm.chat.completions.create(
+          messages=messages,
+          model= server.llm_choice,
+          stream=True,
+      )
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+
+@app.route("/api/chat", methods=["POST"])
+async def chat():
+    print('Chat request received.')
+    try:
+        await asyncio.to_thread(startup.wait_for, "index", STARTUP_WAIT_TIMEOUT)
+    except NotReady as e:
+        return not_ready_response(e)
+    data = await request.get_json()
+    try:
+        session, conversation = await asyncio.to_thread(open_conversation, data)
+    except SessionExpired as e:
+        return session_expired_response(e)
+    prompt, chat_history = build_chat_history(data.get("prompt", ""), conversation, data.get("conversation_id"), session)
+
+    if chat_history is None:
+        return jsonify({"reply": "Please say something."}), 400
+
+    # Only overlaps the cache check in 'retrieve' mode, see server.start_retrieval()
+    context_task = astart_retrieval(prompt, before_cache=True)
+
+    cache_key = response_cache_key(prompt, conversation)
+    if cache_key is not None:
+        cached = await asyncio.to_thread(response_cache.lookup, prompt, cache_key)
+        if cached is not None:
+            if context_task is not None:
+                context_task.cancel()
+            return jsonify(finish_turn(session, data.get("prompt", ""), cached))
+
+    if context_task is None:
+        context_task = astart_retrieval(prompt)
+
+    chat_completion = await allm.chat.completions.create(
+          messages=await aground_chat_history(prompt, chat_history, context_task),
+          model= server.llm_choice,
+      )
+
+    response = chat_completion.choices[0].message.content
+
+    results = await asyncio.to_thread(run_sensor_tool, response)
+
+    if len(results)>0:
+        chat_completion = await allm.chat.completions.create(
+              messages=chat_history+[{'role':'system', 'content':results}],
+              model= server.llm_choice,
+          )
+
+    response = chat_completion.choices[0].message.content
+
+    print('Avatar response:', response)
+
+    if cache_key is not None and len(results)==0:
+        await asyncio.to_thread(response_cache.store, prompt, response, cache_key)
+
+    return jsonify(finish_turn(session, data.get("prompt", ""), response))
+
+
+
+@app.route("/api/chat-stream", methods=["POST"])
+async def chat_stream():
+    """Same events as server.chat_stream()."""
+    print('Chat stream request received.')
+    try:
+        await asyncio.to_thread(startup.wait_for, "index", STARTUP_WAIT_TIMEOUT)
+    except NotReady as e:
+        return not_ready_response(e)
+    data = await request.get_json()
+    try:
+        session, conversation = await asyncio.to_thread(open_conversation, data)
+    except SessionExpired as e:
+        return session_expired_response(e)
+    prompt, chat_history = build_chat_history(data.get("prompt", ""), conversation, data.get("conversation_id"), session)
+
+    if chat_history is None:
+        return jsonify({"reply": "Please say something."}), 400
+
+    # Only overlaps the cache check in 'retrieve' mode, see server.start_retrieval()
+    context_task = astart_retrieval(prompt, before_cache=True)
+
+    cache_key = response_cache_key(prompt, conversation)
+    cached = None
+    if cache_key is not None:
+        cached = await asyncio.to_thread(response_cache.lookup, prompt, cache_key)
+    if cached is not None:
+        if context_task is not None:
+            context_task.cancel()
+        return Response(
+            sse_event({"delta": cached}) + sse_event(finish_turn(session, data.get("prompt", ""), cached), event="done"),
+            mimetype="text/event-stream",
+        )
+
+    if context_task is None:
+        context_task = astart_retrieval(prompt)
+
+    async def generate():
+        grounded_history = await aground_chat_history(prompt, chat_history, context_task)
+
+        tool_filter = ToolCallFilter()
+        async for delta in astream_completion(grounded_history):
+            text = tool_filter.feed(delta)
+            if text:
+                yield sse_event({"delta": text})
+
+        text = tool_filter.flush()
+        if text:
+            yield sse_event({"delta": text})
+
+        response = tool_filter.response
+        if tool_filter.tool_called:
+            if tool_filter.sent > 0:
+                yield sse_event({}, event="reset")
+            results = await asyncio.to_thread(run_sensor_tool, response)
+            response = ''
+            async for delta in astream_completion(chat_history+[{'role':'system', 'content':results}]):
+                response += delta
+                yield sse_event({"delta": delta})
+
+        print('Avatar response:', response)
+        if cache_key is not None and not tool_filter.tool_called:
+            await asyncio.to_thread(response_cache.store, prompt, response, cache_key)
+        yield sse_event(finish_turn(session, data.get("prompt", ""), response), event="done")
+
+    return Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+
+@app.route("/api/debate-summary", methods=["POST"])
+async def debate_summary():
+    print('Debate Summary request received.')
+    data = await request.get_json()
+    try:
+        session, prompt, upto, summary = await asyncio.to_thread(prepare_debate_summary, data)
+    except SessionExpired as e:
+        return session_expired_response(e)
+    if prompt is None:
+        return jsonify({"summary": summary})
+
+    response = await server.debate_summary_llm.acomplete(prompt)
+    return jsonify(await asyncio.to_thread(finish_debate_summary, session, str(response), upto))
+
+
+
+@app.route("/api/voice-chat", methods=["POST"])
+async def voice_chat():
+    files = await request.files
+    if "audio" not in files:
+        return jsonify({"error": "No audio uploaded"}), 400
+
+    audio_bytes = files["audio"].read()
+    inline = request.args.get("inline") == "1"
+
+    try:
+        reply_text, reply_wav = await realtime_pool.arun(azure_speech_response_func(audio_bytes))
+        # keep the reply in memory under its own id
+        reply_id = reply_audio_store.put(reply_wav)
+        payload = {
+            "reply_text": reply_text,
+            "reply_id": reply_id,
+            "reply_audio_url": f"{REPLY_AUDIO_URL}/{reply_id}",
+        }
+        if inline:
+            payload["reply_audio"] = base64.b64encode(reply_wav).decode()
+        return jsonify(payload)
+    except Exception as e:
+        print("❌ Voice chat error:", e)
+        return jsonify({"error": "Voice chat failed"}), 500
+
+
+
+@app.route("/api/voice-chat-stream", methods=["POST"])
+async def voice_chat_stream():
+    """Event format as in server.voice_stream_events."""
+    files = await request.files
+    if "audio" not in files:
+        return jsonify({"error": "No audio uploaded"}), 400
+
+    audio_bytes = files["audio"].read()
+
+    async def generate():
+        text_parts = []
+        try:
+            async for kind, delta in realtime_pool.aiterate(azure_speech_stream(audio_bytes)):
+                if kind == "text":
+                    text_parts.append(delta)
+                    yield sse_event({"delta": delta})
+                else:
+                    yield sse_event({"audio": base64.b64encode(delta).decode(), "sample_rate": OUTPUT_SAMPLERATE}, event="audio")
+            yield sse_event({"reply": "".join(text_parts)}, event="done")
+        except Exception as e:
+            print("❌ Voice chat error:", e)
+            yield sse_event({"error": "Voice chat failed"}, event="error")
+
+    return Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+
+@app.websocket("/api/voice-duplex")
+async def voice_duplex():
+    """Continuous voice conversation with server VAD and barge-in, see DuplexVoiceSession."""
+    try:
+        await DuplexVoiceSession(websocket.receive, websocket.send).run()
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        print("❌ Duplex voice error:", e)
+        await websocket.send(json.dumps({"type": "error", "error": "Voice chat failed"}))
+
+
+
+@app.route("/api/reply-audio/<reply_id>")
+async def reply_audio(reply_id):
+    entry = reply_audio_store.get(reply_id)
+    if entry is None:
+        return "", 404
+    audio, mimetype = entry
+    response = Response(audio, mimetype=mimetype)
+    response.headers["Access-Control-Allow-Headers"] = "Content-Type"
+    return response
+
+
+
+@app.route("/api/experience-upload", methods=["POST"])
+async def experience_upload():
+    print("Experience upload received.")
+    timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S_%f")
+    form = await request.form
+    files = await request.files
+
+    os.makedirs(UPLOAD_DIR+'/text', exist_ok=True)
+    text = form.get("text", "")
+    if text.strip():
+        with open(os.path.join(UPLOAD_DIR+'/text', f"{timestamp}_message.txt"), "w", encoding="utf-8") as f:
+            f.write(text.strip())
+
+    if "audio" in files:
+        audio_file = files["audio"]
+        if audio_file and audio_file.filename:
+            safe_name = secure_filename(audio_file.filename)
+            file_ext = os.path.splitext(safe_name)[1]
+            audio_path = os.path.join(UPLOAD_DIR, f"{timestamp}_audio{file_ext}")
+            audio_bytes = audio_file.read()
+            with open(audio_path, "wb") as f:
+                f.write(audio_bytes)
+
+            try:
+                job_id = transcription_queue.submit(audio_bytes, on_done=transcript_writer(timestamp))
+            except queue.Full:
+                print("❌ Transcription queue full.")
+                return jsonify({"status": "error", "message": "Audio saved, but transcription queue is full."}), 503
+            return jsonify({"status": "success", "message": "Experience saved.", "job_id": job_id}), 202
+
+    return jsonify({"status": "success", "message": "Experience saved."})
+
+
+
+@app.route("/api/experience-upload/<job_id>")
+async def experience_upload_status(job_id):
+    status = transcription_queue.status(job_id)
+    if status is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(status)
+
+
+if __name__ == "__main__":
+    app.run()
@@ -0,0 +1,73 @@
+import io, subprocess
+
+import numpy as np
+import soundfile as sf
+import torch, torchaudio
+
+try:
+    import av  # PyAV, decodes the webm/opus recordings from the browser in-process
+except ImportError:
+    av = None
+
+
+TARGET_SR = 16000
+
+
+def resample(audio: np.ndarray, sr: int, target_sr: int = TARGET_SR) -> np.ndarray:
+    if sr == target_sr:
+        return audio
+    return torchaudio.functional.resample(torch.from_numpy(audio), sr, target_sr).numpy()
+
+
+def decode_with_soundfile(data: bytes, target_sr: int) -> np.ndarray:
+    # wav / flac / ogg (vorbis, opus with libsndfile >= 1.0.29)
+    audio, sr = sf.read(io.BytesIO(data), dtype="float32", always_2d=True)
+    return resample(audio.mean(axis=1), sr, target_sr)
+
+
+def decode_with_av(data: bytes, target_sr: int) -> np.ndarray:
+    # webm / mp4 / ogg containers; PyAV's resampler also downmixes to mono
+    resampler = av.AudioResampler(format="s16", layout="mono", rate=target_sr)
+    chunks = []
+    with av.open(io.BytesIO(data), mode="r") as container:
+        for frame in container.decode(audio=0):
+            for out in resampler.resample(frame):
+                chunks.append(out.to_ndarray().reshape(-1))
+        for out in resampler.resample(None):
+            chunks.append(out.to_ndarray().reshape(-1))
+    if not chunks:
+        raise ValueError("no audio frames decoded")
+    return np.concatenate(chunks).astype(np.float32) / 32768.0
+
+
+def decode_with_ffmpeg(data: bytes, target_sr: int) -> np.ndarray:
+    # Fallback for codecs neither libsndfile nor PyAV handle; piped, no temp files
+    raw = subprocess.run(
+        ["ffmpeg", "-nostdin", "-i", "pipe:0", "-f", "s16le", "-ac", "1", "-ar", str(target_sr), "pipe:1"],
+        input=data, check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+    ).stdout
+    return np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def decode_audio(source, target_sr: int = TARGET_SR) -> np.ndarray:
+    """
+    Decodes an uploaded recording (bytes, file-like or path) to mono float32
+    at target_sr, in memory. Tries libsndfile, then PyAV, then ffmpeg.
+    """
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            source = f.read()
+    elif not isinstance(source, bytes):
+        source = source.read()
+
+    decoders = [decode_with_soundfile] + ([decode_with_av] if av is not None else []) + [decode_with_ffmpeg]
+    for decoder in decoders:
+        try:
+            return decoder(source, target_sr)
+        except Exception as e:
+            last_error = e
+    raise RuntimeError(f"Could not decode audio: {last_error}")
+
+
+def to_pcm16(audio: np.ndarray) -> np.ndarray:
+    return (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
@@ -17,6 +17,7 @@ from llama_index.core.readers import SimpleDirectoryReader
 from llama_index.core.indices.vector_store import VectorStoreIndex
 from llama_index.core.memory import ChatMemoryBuffer
 from llama_index.core.settings import Settings
+from llama_index.core.utils import get_tokenizer
 from llama_index.readers.web import SimpleWebPageReader
 
 
@@ -28,6 +29,7 @@ from llama_index.embeddings.huggingface import HuggingFaceEmbedding
 # from llama_index.embeddings.azure_openai import AzureOpenAIEmbedding
 
 from .gwdg_llm import GWDGChatLLM
+from .prompt_store import system_prompt_store
 
 
 load_dotenv()
@@ -130,10 +132,8 @@ def select_model():
 
 
 def get_llm(mode='openai',model_name=None, system_prompt=None):
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    file_path = os.path.join(base_dir, 'system_prompt.txt')
     if system_prompt == None:
-        system_prompt = open(file_path, 'r').read()
+        system_prompt = system_prompt_store.get().text
 
     # system_prompt += '\n You MUST ALWAYS call a function to answer any question. DO NOT respond directly. You have no knowledge or memory outside what you retrieve using the provided tools.\n'
 
@@ -242,6 +242,18 @@ def build_index():
 
 
 
+_embed_model = None
+
+
+def load_embed_model():
+    """Loads the HuggingFace embedder once and makes it the llama-index default."""
+    global _embed_model
+    if _embed_model is None:
+        _embed_model = HuggingFaceEmbedding(model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+    Settings.embed_model = _embed_model
+    return _embed_model
+
+
 def build_or_load_index(refresh=False):
     # Settings.embed_model = AzureOpenAIEmbedding(
     #     model="text-embedding-3-large",
@@ -251,7 +263,7 @@ def build_or_load_index(refresh=False):
     #     api_version=AZURE_VERSION,
     # )
 
-    Settings.embed_model = HuggingFaceEmbedding(model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+    load_embed_model()
 
     # GWDGEmbedding(
     #     api_key=API_KEY,
@@ -276,6 +288,38 @@ def build_or_load_index(refresh=False):
     return index
 
 
+def format_retrieved_context(nodes, token_budget=2000):
+    """
+    Joins the texts of retrieved nodes into one context string, skipping
+    duplicates and stopping once token_budget is used up. Nodes are expected
+    in retriever order (best match first).
+    """
+    tokenizer = get_tokenizer()
+    seen = []
+    parts = []
+    used = 0
+
+    for node in nodes:
+        text = node.get_content().strip()
+        key = " ".join(text.lower().split())
+        if not key or any(key in s for s in seen):
+            continue
+        seen.append(key)
+
+        tokens = tokenizer(text)
+        if used + len(tokens) > token_budget:
+            remaining = token_budget - used
+            if remaining > 50:
+                # Trim the last chunk instead of dropping it completely
+                parts.append(text[:len(text) * remaining // len(tokens)])
+            break
+
+        parts.append(text)
+        used += len(tokens)
+
+    return "\n\n".join(parts)
+
+
 def main():
     console = Console()
     console.print("[bold cyan]Lahn River AI Avatar[/bold cyan]\n")
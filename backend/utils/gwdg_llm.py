@@ -1,11 +1,13 @@
-from typing import Any, Generator, List
+from typing import Any, Generator, List, Sequence
 from pydantic import Field
 from llama_index.core.llms import (
     CustomLLM,
     ChatResponse, 
     ChatResponseGen,
+    ChatResponseAsyncGen,
     CompletionResponse,
     CompletionResponseGen,
+    CompletionResponseAsyncGen,
     LLMMetadata,
     ChatMessage
 )
@@ -14,7 +16,83 @@ from llama_index.llms.openai import OpenAI
 
 from llama_index.core.llms.callbacks import llm_completion_callback, llm_chat_callback
 from llama_index.core.base.embeddings.base import BaseEmbedding
-import requests, json
+from llama_index.core.base.llms.generic_utils import (
+    completion_response_to_chat_response,
+    astream_completion_response_to_chat_response,
+)
+import httpx, json, os, threading, weakref, asyncio
+
+
+# Connection pool shared by every GWDG LLM / embedding instance, so that calls
+# to the same host reuse keep-alive connections instead of a new TCP+TLS handshake.
+HTTP_POOL_SIZE = int(os.getenv("GWDG_HTTP_POOL_SIZE", "20"))
+HTTP_TIMEOUT = float(os.getenv("GWDG_HTTP_TIMEOUT", "120"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("GWDG_HTTP_CONNECT_TIMEOUT", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("GWDG_HTTP_KEEPALIVE_EXPIRY", "60"))
+
+_http_client = None
+_http_client_lock = threading.Lock()
+
+
+def http2_available() -> bool:
+    # httpx only speaks HTTP/2 when the optional h2 package is installed
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def http_client_options() -> dict:
+    return dict(
+        http2=http2_available(),
+        timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=HTTP_POOL_SIZE,
+            max_keepalive_connections=HTTP_POOL_SIZE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+    )
+
+
+def get_http_client() -> httpx.Client:
+    """Returns the process-wide pooled HTTP client (created on first use)."""
+    global _http_client
+    if _http_client is None:
+        with _http_client_lock:
+            if _http_client is None:
+                _http_client = httpx.Client(**http_client_options())
+    return _http_client
+
+
+# httpx.AsyncClient is bound to the event loop it was first used on, so keep one per loop
+_async_http_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Returns the pooled async HTTP client of the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _async_http_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(**http_client_options())
+        _async_http_clients[loop] = client
+    return client
+
+
+def parse_sse_delta(line: str):
+    """
+    Parses one line of an OpenAI-style `stream: true` response.
+    Returns the content delta ('' for lines without content) or None once the stream is done.
+    """
+    if not line or not line.startswith("data: "):
+        return ''
+    chunk = line.removeprefix("data: ")
+    if chunk.strip() == "[DONE]":
+        return None
+    data = json.loads(chunk)
+    if not data.get("choices"):
+        return ''
+    return data["choices"][0]["delta"].get("content") or ''
 
 
 
@@ -37,10 +115,6 @@ class HrzOpenAI(OpenAI):
 
 
 
-import json
-import requests
-from pydantic import Field
-from typing import Any, List
 from llama_index.llms.openai_like import OpenAILike
 
 class CustomOpenAILike(OpenAILike):
@@ -78,12 +152,13 @@ class CustomOpenAILike(OpenAILike):
     #     # force‐enable the function‐calling machinery
     #     return True
 
-    @llm_chat_callback()
-    def chat(self, messages: List[dict], **kwargs: Any) -> CompletionResponse:
-        headers = {
+    def _headers(self) -> dict:
+        return {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
         }
+
+    def _payload(self, messages: List[dict], stream: bool = False) -> dict:
         # turn each ChatMessage (or dict) into the simple OpenAI dict form
         serialized = []
         for m in messages:
@@ -102,8 +177,14 @@ class CustomOpenAILike(OpenAILike):
             ],
             "temperature": self.temperature,
         }
+        if stream:
+            payload["stream"] = True
+        return payload
+
+    @llm_chat_callback()
+    def chat(self, messages: List[dict], **kwargs: Any) -> ChatResponse:
         url = f"{self.api_base}/chat/completions"
-        resp = requests.post(url, headers=headers, json=payload)
+        resp = get_http_client().post(url, headers=self._headers(), json=self._payload(messages))
         resp.raise_for_status()
         data = resp.json()
         text = data["choices"][0]["message"]["content"]
@@ -112,50 +193,53 @@ class CustomOpenAILike(OpenAILike):
         )
 
     @llm_chat_callback()
-    def stream_chat(self, messages: List[dict], **kwargs: Any) -> CompletionResponseGen:
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-        }
-        # payload = {
-        #     "model": self.model,
-        #     "messages": [
-        #         {"role": "system", "content": self.system_prompt},
-        #         *messages
-        #     ],
-        #     "temperature": self.temperature,
-        #     "stream": True,
-        # }
-
-        serialized = []
-        for m in messages:
-            if hasattr(m, "role") and hasattr(m, "content"):
-                serialized.append({"role": m.role, "content": m.content})
-            else:
-                serialized.append(m)
-
-        payload = {
-            "model": self.model,
-            "messages": [
-                {"role": "system", "content": self.system_prompt},
-                *serialized
-            ],
-            "temperature": self.temperature,
-            "stream": True,
-        }
+    def stream_chat(self, messages: List[dict], **kwargs: Any) -> ChatResponseGen:
+        url = f"{self.api_base}/chat/completions"
+        payload = self._payload(messages, stream=True)
+
+        def gen() -> ChatResponseGen:
+            text = ""
+            with get_http_client().stream("POST", url, headers=self._headers(), json=payload) as resp:
+                resp.raise_for_status()
+                for line in resp.iter_lines():
+                    delta = parse_sse_delta(line)
+                    if delta is None:
+                        break
+                    if delta:
+                        text += delta
+                        yield ChatResponse(message=ChatMessage(role="assistant", content=text), delta=delta)
+
+        return gen()
 
+    @llm_chat_callback()
+    async def achat(self, messages: List[dict], **kwargs: Any) -> ChatResponse:
         url = f"{self.api_base}/chat/completions"
-        resp = requests.post(url, headers=headers, json=payload, stream=True)
+        resp = await get_async_http_client().post(url, headers=self._headers(), json=self._payload(messages))
         resp.raise_for_status()
-        for line in resp.iter_lines(decode_unicode=True):
-            if not line or not line.startswith("data: "):
-                continue
-            chunk = line.removeprefix("data: ")
-            if chunk.strip() == "[DONE]":
-                break
-            data = json.loads(chunk)
-            delta = data["choices"][0]["delta"].get("content", "")
-            yield ChatResponse(text=delta, delta=delta)
+        data = resp.json()
+        text = data["choices"][0]["message"]["content"]
+        return ChatResponse(
+            message=ChatMessage(role="assistant", content=text)
+        )
+
+    @llm_chat_callback()
+    async def astream_chat(self, messages: List[dict], **kwargs: Any) -> ChatResponseAsyncGen:
+        url = f"{self.api_base}/chat/completions"
+        payload = self._payload(messages, stream=True)
+
+        async def gen() -> ChatResponseAsyncGen:
+            text = ""
+            async with get_async_http_client().stream("POST", url, headers=self._headers(), json=payload) as resp:
+                resp.raise_for_status()
+                async for line in resp.aiter_lines():
+                    delta = parse_sse_delta(line)
+                    if delta is None:
+                        break
+                    if delta:
+                        text += delta
+                        yield ChatResponse(message=ChatMessage(role="assistant", content=text), delta=delta)
+
+        return gen()
 
 # from llama_index.core.llms.function_calling import FunctionCallingLLM , LLMMetadata
 # from llama_index.core.base.llms.types import ChatMessage, ChatResponse, MessageRole
@@ -436,13 +520,13 @@ class GWDGChatLLM(CustomLLM):
         )
 
 
-    @llm_completion_callback()
-    def complete(self, prompt: str, **kwargs: Any) -> CompletionResponse:
-        headers = {
+    def _headers(self) -> dict:
+        return {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
         }
 
+    def _payload(self, prompt: str, stream: bool = False) -> dict:
         payload = {
             "model": self.model,
             "messages": [
@@ -451,6 +535,45 @@ class GWDGChatLLM(CustomLLM):
             ],
             "temperature": self.temperature,
         }
+        if stream:
+            payload["stream"] = True
+        return payload
+
+    def _handle_http_error(self, response, error, attempt: int, max_retries: int):
+        """
+        Shared error handling of complete() and acomplete().
+        Returns the CompletionResponse to hand back, or None to retry.
+        """
+        raw_text = response.text[:500]
+        print(f"❌ HTTPError (attempt {attempt}):", error)
+        print("📨 Raw content:", raw_text)
+        print('Model used: ', self.model)
+
+        if "404: Model not found" in raw_text and attempt < max_retries:
+            print(f"🔁 Retrying request (attempt {attempt + 1}/{max_retries})...")
+            return None
+
+        try:
+            data = response.json()
+            if "choices" in data and data["choices"]:
+                fallback_text = data["choices"][0]["message"]["content"]
+                print("⚠️ Using fallback content despite HTTP error.")
+                return CompletionResponse(text=fallback_text)
+        except Exception as parse_err:
+            print("❌ Failed to parse fallback content:", parse_err)
+
+        if attempt == max_retries:
+            return CompletionResponse(
+                text="I'm currently experiencing technical issues. Please try again later."
+            )
+
+        # Otherwise continue retrying
+        return None
+
+
+    @llm_completion_callback()
+    def complete(self, prompt: str, **kwargs: Any) -> CompletionResponse:
+        payload = self._payload(prompt)
 
         print('Payload: ', payload)
 
@@ -459,45 +582,92 @@ class GWDGChatLLM(CustomLLM):
 
         for attempt in range(1, max_retries + 1):
             try:
-                response = requests.post(url, headers=headers, json=payload)
+                response = get_http_client().post(url, headers=self._headers(), json=payload)
                 response.raise_for_status()
 
                 content = response.json()["choices"][0]["message"]["content"]
                 return CompletionResponse(text=content)
 
-            except requests.HTTPError as e:
-                raw_text = response.text[:500]
-                print(f"❌ HTTPError (attempt {attempt}):", e)
-                print("📨 Raw content:", raw_text)
-                print('Model used: ', self.model)
+            except httpx.HTTPStatusError as e:
+                result = self._handle_http_error(response, e, attempt, max_retries)
+                if result is not None:
+                    return result
+
 
-                if "404: Model not found" in raw_text and attempt < max_retries:
-                    print(f"🔁 Retrying request (attempt {attempt + 1}/{max_retries})...")
-                    continue
+    @llm_completion_callback()
+    async def acomplete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        payload = self._payload(prompt)
 
-                try:
-                    data = response.json()
-                    if "choices" in data and data["choices"]:
-                        fallback_text = data["choices"][0]["message"]["content"]
-                        print("⚠️ Using fallback content despite HTTP error.")
-                        return CompletionResponse(text=fallback_text)
-                except Exception as parse_err:
-                    print("❌ Failed to parse fallback content:", parse_err)
+        url = f"{self.api_base}/chat/completions"
+        max_retries = 5
 
-                if attempt == max_retries:
-                    return CompletionResponse(
-                        text="I'm currently experiencing technical issues. Please try again later."
-                    )
+        for attempt in range(1, max_retries + 1):
+            try:
+                response = await get_async_http_client().post(url, headers=self._headers(), json=payload)
+                response.raise_for_status()
+
+                content = response.json()["choices"][0]["message"]["content"]
+                return CompletionResponse(text=content)
+
+            except httpx.HTTPStatusError as e:
+                result = self._handle_http_error(response, e, attempt, max_retries)
+                if result is not None:
+                    return result
+
+
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponseGen:
+        url = f"{self.api_base}/chat/completions"
+        payload = self._payload(prompt, stream=True)
 
-                # Otherwise continue retrying
-                continue
+        def gen() -> CompletionResponseGen:
+            text = ""
+            with get_http_client().stream("POST", url, headers=self._headers(), json=payload) as resp:
+                resp.raise_for_status()
+                for line in resp.iter_lines():
+                    delta = parse_sse_delta(line)
+                    if delta is None:
+                        break
+                    if delta:
+                        text += delta
+                        yield CompletionResponse(text=text, delta=delta)
 
+        return gen()
 
 
     @llm_completion_callback()
-    def stream_complete(self, prompt: str, **kwargs: Any) -> CompletionResponseGen:
-        full_response = self.complete(prompt)
-        yield CompletionResponse(text=full_response.text, delta=full_response.text)
+    async def astream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponseAsyncGen:
+        url = f"{self.api_base}/chat/completions"
+        payload = self._payload(prompt, stream=True)
+
+        async def gen() -> CompletionResponseAsyncGen:
+            text = ""
+            async with get_async_http_client().stream("POST", url, headers=self._headers(), json=payload) as resp:
+                resp.raise_for_status()
+                async for line in resp.aiter_lines():
+                    delta = parse_sse_delta(line)
+                    if delta is None:
+                        break
+                    if delta:
+                        text += delta
+                        yield CompletionResponse(text=text, delta=delta)
+
+        return gen()
+
+
+    @llm_chat_callback()
+    async def achat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        prompt = self.messages_to_prompt(messages)
+        completion_response = await self.acomplete(prompt, formatted=True, **kwargs)
+        return completion_response_to_chat_response(completion_response)
+
+
+    @llm_chat_callback()
+    async def astream_chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponseAsyncGen:
+        prompt = self.messages_to_prompt(messages)
+        completion_response_gen = await self.astream_complete(prompt, formatted=True, **kwargs)
+        return astream_completion_response_to_chat_response(completion_response_gen)
 
 
 class GWDGEmbedding(BaseEmbedding):
@@ -510,37 +680,42 @@ class GWDGEmbedding(BaseEmbedding):
     #     self.api_base = api_base
     #     self.model = model
 
-    def _get_text_embedding(self, text: str) -> List[float]:
-        """Get embedding for a single text string."""
-        headers = {
+    def _headers(self) -> dict:
+        return {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
         }
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        """Get embedding for a single text string."""
+        # Important: send it as a list even for one input
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Get embeddings for a batch of texts."""
         payload = {
             "model": self.model,
-            "input": [text],  # Important: send it as a list even for one input
+            "input": texts,
         }
-        response = requests.post(
+        response = get_http_client().post(
             f"{self.api_base}/embeddings",
-            headers=headers,
+            headers=self._headers(),
             json=payload,
         )
         response.raise_for_status()
-        return response.json()["data"][0]["embedding"]
+        return [item['embedding'] for item in response.json()["data"]]
 
-    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """Get embeddings for a batch of texts."""
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-        }
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        return (await self._aget_text_embeddings([text]))[0]
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
         payload = {
             "model": self.model,
             "input": texts,
         }
-        response = requests.post(
+        response = await get_async_http_client().post(
             f"{self.api_base}/embeddings",
-            headers=headers,
+            headers=self._headers(),
             json=payload,
         )
         response.raise_for_status()
@@ -550,6 +725,5 @@ class GWDGEmbedding(BaseEmbedding):
     def _get_query_embedding(self, query: str) -> List[float]:
         return self._get_text_embedding(query)
 
-    def _aget_query_embedding(self, query: str) -> List[float]:
-        # Async version not yet implemented, fall back to sync
-        return self._get_query_embedding(query)
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return await self._aget_text_embedding(query)
@@ -0,0 +1,148 @@
+import hashlib, json, os, threading, time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from llama_index.core.utils import get_tokenizer
+
+
+# Tokens the system prompt plus the chat history (verbatim turns and summary) may use per
+# chat model; the history gets what the system prompt leaves. Retrieved context comes on top.
+HISTORY_TOKEN_BUDGETS = {
+    "gemma-3-27b-it": int(os.getenv("HISTORY_BUDGET_GEMMA", "4000")),
+    "hrz-chat-small": int(os.getenv("HISTORY_BUDGET_HRZ_SMALL", "2500")),
+}
+DEFAULT_HISTORY_BUDGET = int(os.getenv("HISTORY_BUDGET_DEFAULT", "3000"))
+HISTORY_KEEP_TURNS = int(os.getenv("HISTORY_KEEP_TURNS", "4"))  # user+assistant pairs kept verbatim
+HISTORY_MAX_CONVERSATIONS = int(os.getenv("HISTORY_MAX_CONVERSATIONS", "256"))
+
+SUMMARY_PROMPT = """You maintain a running summary of a conversation between a visitor and the Lahn river (an AI avatar).
+Update the existing summary with the new messages. Keep names, facts, opinions and open questions; drop small talk.
+Answer with the updated summary only, at most 150 words, in the language of the conversation.
+
+Existing summary:
+{summary}
+
+New messages:
+{messages}"""
+
+
+@lru_cache(maxsize=4096)
+def count_tokens(text):
+    return len(get_tokenizer()(text))
+
+
+def message_tokens(message):
+    return count_tokens(message["content"]) + 4  # role / separators
+
+
+def format_messages(messages):
+    names = {"user": "Visitor", "assistant": "Lahn"}
+    return "\n".join(f"{names.get(m['role'], m['role'])}: {m['content']}" for m in messages)
+
+
+def messages_hash(messages):
+    return hashlib.sha1(json.dumps(messages).encode()).hexdigest()
+
+
+class HistoryManager:
+    """
+    Keeps the chat history sent to the LLM within a per-model token budget.
+    The last `keep_turns` exchanges are sent verbatim; older messages are
+    folded into a rolling summary per conversation id. Folding runs in the
+    background with summarize(prompt) -> str, so a turn never waits on it:
+    messages that are not summarised yet are sent verbatim while the budget
+    allows (newest first) and dropped otherwise. Without a conversation id
+    nothing is folded: many visitors open with the same (cached) greeting, so
+    the messages can't tell conversations apart.
+    """
+
+    def __init__(self, summarize, keep_turns=HISTORY_KEEP_TURNS, budgets=HISTORY_TOKEN_BUDGETS,
+                 default_budget=DEFAULT_HISTORY_BUDGET, max_conversations=HISTORY_MAX_CONVERSATIONS):
+        self.summarize = summarize
+        self.keep_messages = 2 * keep_turns
+        self.budgets = budgets
+        self.default_budget = default_budget
+        self.max_conversations = max_conversations
+        self.states = OrderedDict()  # conversation id -> {"summary", "upto", "prefix", "pending"}
+        self.lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="history-summary")
+
+    def budget(self, model):
+        return self.budgets.get(model, self.default_budget)
+
+    def _state(self, conversation_id):
+        state = self.states.get(conversation_id)
+        if state is None:
+            state = {"summary": "", "upto": 0, "prefix": messages_hash([]), "pending": False}
+            self.states[conversation_id] = state
+            while len(self.states) > self.max_conversations:
+                self.states.popitem(last=False)
+        self.states.move_to_end(conversation_id)
+        return state
+
+    def window(self, messages, model, conversation_id=None, reserved=0):
+        """
+        messages: the user/assistant history (oldest first, last one is the new prompt).
+        reserved: tokens of the model's budget already taken, i.e. by the system prompt.
+        Returns the messages to send: optional summary message + windowed history.
+        """
+        budget = self.budget(model) - reserved
+        recent = messages[-self.keep_messages:] if self.keep_messages else messages[-1:]
+        older = messages[:len(messages) - len(recent)]
+
+        # Recent turns verbatim; if even those don't fit, drop the oldest (never the prompt)
+        used = sum(message_tokens(m) for m in recent)
+        while len(recent) > 1 and used > budget:
+            used -= message_tokens(recent[0])
+            older = older + [recent[0]]
+            recent = recent[1:]
+        if not older:
+            return list(recent)
+
+        summary, upto = "", 0
+        if conversation_id:
+            with self.lock:
+                state = self._state(conversation_id)
+                if state["upto"] > len(older) or state["prefix"] != messages_hash(older[:state["upto"]]):
+                    # The client's history diverged from what we summarised: start over
+                    state.update(summary="", upto=0, prefix=messages_hash([]))
+                summary, upto = state["summary"], state["upto"]
+                # Fold whole exchanges, not every single message
+                if len(older) - upto >= 2 and not state["pending"]:
+                    state["pending"] = True
+                    self.pool.submit(self._fold, conversation_id, summary, older, upto)
+
+        prefix = []
+        if summary:
+            prefix = [{'role': 'system', 'content': 'Summary of the earlier conversation: ' + summary}]
+            used += message_tokens(prefix[0])
+
+        # Messages not folded into the summary yet: newest first, as far as the budget allows
+        gap = []
+        for message in reversed(older[upto:]):
+            cost = message_tokens(message)
+            if used + cost > budget:
+                break
+            gap.insert(0, message)
+            used += cost
+
+        return prefix + gap + list(recent)
+
+    def _fold(self, conversation_id, summary, older, upto):
+        try:
+            start = time.time()
+            new_summary = self.summarize(SUMMARY_PROMPT.format(
+                summary=summary or "(none yet)", messages=format_messages(older[upto:])
+            )).strip()
+            print(f"🧾 Folded {len(older) - upto} messages into the summary of {conversation_id[:8]} in {time.time() - start:.1f} s.")
+        except Exception as e:
+            print("❌ History summary failed:", e)
+            new_summary = None
+        with self.lock:
+            state = self.states.get(conversation_id)
+            if state is None:
+                return
+            state["pending"] = False
+            if new_summary and state["upto"] == upto and state["summary"] == summary:
+                state.update(summary=new_summary, upto=len(older), prefix=messages_hash(older))
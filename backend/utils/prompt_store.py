@@ -0,0 +1,87 @@
+import os, threading, time
+from dataclasses import dataclass
+
+from llama_index.core.utils import get_tokenizer
+
+
+SYSTEM_PROMPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'system_prompt.txt')
+PROMPT_CHECK_INTERVAL = float(os.getenv("PROMPT_CHECK_INTERVAL", "2"))  # seconds between mtime checks
+
+
+@dataclass(frozen=True)
+class SystemPrompt:
+    text: str
+    tokens: list
+    token_count: int
+    version: int
+    mtime: float
+
+    def __str__(self):
+        return self.text
+
+
+class SystemPromptStore:
+    """
+    Process-wide cache of system_prompt.txt. The file is read (and tokenised)
+    once and reloaded only when its mtime changes or refresh() is called;
+    get() hands out the current immutable SystemPrompt. Callbacks registered
+    with on_change() run after every reload that changed the text.
+    """
+
+    def __init__(self, path=SYSTEM_PROMPT_PATH, check_interval=PROMPT_CHECK_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self.prompt = None
+        self.last_check = 0.0
+        self.listeners = []
+        self.lock = threading.Lock()
+
+    def on_change(self, callback):
+        self.listeners.append(callback)
+
+    def _load(self, mtime):
+        with open(self.path, 'r') as f:
+            text = f.read()
+        if self.prompt is not None and text == self.prompt.text:
+            self.prompt = SystemPrompt(text, self.prompt.tokens, self.prompt.token_count, self.prompt.version, mtime)
+            return False
+        tokens = get_tokenizer()(text)
+        version = self.prompt.version + 1 if self.prompt is not None else 1
+        self.prompt = SystemPrompt(text, tokens, len(tokens), version, mtime)
+        print(f"📜 System prompt v{version} loaded ({len(tokens)} tokens).")
+        return True
+
+    def get(self) -> SystemPrompt:
+        now = time.time()
+        if self.prompt is not None and now - self.last_check < self.check_interval:
+            return self.prompt
+        changed = False
+        with self.lock:
+            self.last_check = now
+            mtime = os.path.getmtime(self.path)
+            if self.prompt is None or mtime != self.prompt.mtime:
+                changed = self._load(mtime)
+            prompt = self.prompt
+        if changed and prompt.version > 1:
+            self._notify()
+        return prompt
+
+    def refresh(self) -> SystemPrompt:
+        """Reloads the file now, e.g. after /api/refresh-prompt rewrote it."""
+        with self.lock:
+            self.last_check = time.time()
+            changed = self._load(os.path.getmtime(self.path))
+            prompt = self.prompt
+        if changed and prompt.version > 1:
+            self._notify()
+        return prompt
+
+    def _notify(self):
+        for callback in self.listeners:
+            try:
+                callback()
+            except Exception as e:
+                print("⚠️ System prompt listener failed:", e)
+
+
+system_prompt_store = SystemPromptStore()
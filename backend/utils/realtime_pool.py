@@ -0,0 +1,170 @@
+import asyncio, os, threading, time
+from contextlib import asynccontextmanager
+
+
+REALTIME_POOL_SIZE = int(os.getenv("REALTIME_POOL_SIZE", "2"))              # warm idle sessions (0 = connect per turn)
+REALTIME_SESSION_MAX_AGE = int(os.getenv("REALTIME_SESSION_MAX_AGE", "1200"))  # realtime sessions are capped at 30 min
+REALTIME_SESSION_MAX_TURNS = int(os.getenv("REALTIME_SESSION_MAX_TURNS", "20"))
+REALTIME_HEALTH_INTERVAL = float(os.getenv("REALTIME_HEALTH_INTERVAL", "30"))
+
+
+class PooledSession:
+    def __init__(self, conn):
+        self.conn = conn
+        self.created = time.time()
+        self.turns = 0
+        self.items = []  # conversation items of the current turn, deleted before reuse
+
+    def track(self, item_id):
+        if item_id and item_id not in self.items:
+            self.items.append(item_id)
+
+
+class RealtimeSessionPool:
+    """
+    Keeps `size` realtime sessions connected and configured (session.update
+    already acknowledged) on a long-running event loop in a background thread,
+    so a voice turn can skip the connect + session-config handshake.
+
+    open_session() is a coroutine returning a configured connection. A
+    health task replaces sessions that are too old or were closed, and
+    refills the pool after sessions are taken. After each turn the turn's
+    conversation items are deleted so the next visitor starts clean.
+
+    Everything that uses a session must run on the pool's loop: run() /
+    iterate() from sync code, arun() / aiterate() from another event loop.
+    """
+
+    def __init__(self, open_session, size=REALTIME_POOL_SIZE, max_age=REALTIME_SESSION_MAX_AGE,
+                 max_turns=REALTIME_SESSION_MAX_TURNS, health_interval=REALTIME_HEALTH_INTERVAL):
+        self.open_session = open_session
+        self.size = size
+        self.max_age = max_age
+        self.max_turns = max_turns
+        self.health_interval = health_interval
+        self.loop = asyncio.new_event_loop()
+        self.idle = []
+        self.wakeup = None
+        self.started = False
+        self.start_lock = threading.Lock()
+
+    def start(self):
+        with self.start_lock:
+            if self.started:
+                return
+            self.started = True
+            threading.Thread(target=self.loop.run_forever, name="realtime-pool", daemon=True).start()
+            asyncio.run_coroutine_threadsafe(self._keep_warm(), self.loop)
+
+    # --- running coroutines on the pool loop ---
+
+    def run(self, coro):
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    async def arun(self, coro):
+        self.start()
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self.loop))
+
+    def iterate(self, agen):
+        self.start()
+        try:
+            while True:
+                try:
+                    yield asyncio.run_coroutine_threadsafe(agen.__anext__(), self.loop).result()
+                except StopAsyncIteration:
+                    break
+        finally:
+            asyncio.run_coroutine_threadsafe(agen.aclose(), self.loop).result()
+
+    async def aiterate(self, agen):
+        self.start()
+        try:
+            while True:
+                try:
+                    yield await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(agen.__anext__(), self.loop))
+                except StopAsyncIteration:
+                    break
+        finally:
+            await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(agen.aclose(), self.loop))
+
+    # --- sessions (pool loop only) ---
+
+    def _healthy(self, session):
+        closed = getattr(getattr(session.conn, "_connection", None), "close_code", None) is not None
+        return (not closed and time.time() - session.created < self.max_age
+                and session.turns < self.max_turns)
+
+    async def _close(self, session):
+        try:
+            await session.conn.close()
+        except Exception as e:
+            print("⚠️ Closing realtime session failed:", e)
+
+    async def _keep_warm(self):
+        self.wakeup = asyncio.Event()
+        while True:
+            for session in [s for s in self.idle if not self._healthy(s)]:
+                self.idle.remove(session)
+                await self._close(session)
+            while len(self.idle) > self.size:  # a session came back while a refill was connecting
+                await self._close(self.idle.pop(0))
+            while len(self.idle) < self.size:
+                try:
+                    self.idle.append(PooledSession(await self.open_session()))
+                except Exception as e:
+                    print("❌ Failed to open realtime session:", e)
+                    break
+            self.wakeup.clear()
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), self.health_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    @asynccontextmanager
+    async def session(self):
+        """Yields a warm PooledSession (or a fresh one if none is ready)."""
+        session = None
+        while self.idle and session is None:
+            candidate = self.idle.pop(0)
+            if self._healthy(candidate):
+                session = candidate
+            else:
+                await self._close(candidate)
+        if session is None:
+            print("⚠️ No warm realtime session, connecting...")
+            session = PooledSession(await self.open_session())
+        if self.wakeup is not None:
+            self.wakeup.set()
+
+        try:
+            yield session
+        except BaseException:
+            await self._close(session)
+            raise
+
+        session.turns += 1
+        try:
+            for item_id in session.items:
+                await session.conn.conversation.item.delete(item_id=item_id)
+            session.items = []
+        except Exception as e:
+            print("⚠️ Could not reset realtime session:", e)
+            await self._close(session)
+            return
+        if len(self.idle) < self.size and self._healthy(session):
+            self.idle.append(session)
+        else:
+            await self._close(session)
+
+    async def _recycle(self):
+        idle, self.idle = self.idle, []
+        for session in idle:
+            await self._close(session)
+        if self.wakeup is not None:
+            self.wakeup.set()
+
+    def recycle(self):
+        """Replaces all idle sessions, e.g. after the system prompt changed."""
+        if self.started:
+            asyncio.run_coroutine_threadsafe(self._recycle(), self.loop)
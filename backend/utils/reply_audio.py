@@ -0,0 +1,49 @@
+import os, threading, time, uuid
+from collections import OrderedDict
+
+
+REPLY_AUDIO_TTL = int(os.getenv("REPLY_AUDIO_TTL", "300"))  # seconds
+REPLY_AUDIO_MAX_ENTRIES = int(os.getenv("REPLY_AUDIO_MAX_ENTRIES", "64"))
+
+
+class ReplyAudioStore:
+    """
+    Bounded in-memory store for voice-chat reply audio. Each reply gets its
+    own id, so concurrent voice users don't overwrite each other's audio.
+    Entries expire after ttl seconds; the oldest is evicted beyond max_entries.
+    """
+
+    def __init__(self, ttl=REPLY_AUDIO_TTL, max_entries=REPLY_AUDIO_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def put(self, audio: bytes, mimetype="audio/wav") -> str:
+        reply_id = uuid.uuid4().hex
+        with self.lock:
+            self._evict()
+            self.entries[reply_id] = (time.time(), audio, mimetype)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return reply_id
+
+    def get(self, reply_id):
+        """Returns (audio, mimetype), or None if unknown or expired."""
+        with self.lock:
+            self._evict()
+            entry = self.entries.get(reply_id)
+        if entry is None:
+            return None
+        return entry[1], entry[2]
+
+    def _evict(self):
+        cutoff = time.time() - self.ttl
+        while self.entries:
+            oldest_id, (created, _, _) = next(iter(self.entries.items()))
+            if created >= cutoff:
+                break
+            del self.entries[oldest_id]
+
+
+reply_audio_store = ReplyAudioStore()
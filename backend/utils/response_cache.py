@@ -0,0 +1,103 @@
+import re, threading, time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def normalize_prompt(prompt: str) -> str:
+    # "Wie geht es dir?" and "wie geht's dir" should land on the same key as far as possible
+    prompt = re.sub(r"[^\w\s]", "", prompt.lower())
+    return " ".join(prompt.split())
+
+
+class SemanticResponseCache:
+    """
+    Caches chat replies keyed on an embedding of the normalised user prompt.
+    A lookup hits if a non-expired entry with the same context key has a cosine
+    similarity >= threshold. Entries expire after ttl seconds and the least
+    recently used entry is evicted once max_entries is reached.
+
+    embed_fn: callable mapping a string to its embedding, e.g. Settings.embed_model.get_query_embedding
+    """
+
+    def __init__(self, embed_fn, threshold=0.92, ttl=6 * 3600, max_entries=512):
+        self.embed_fn = embed_fn
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # (context_key, normalised prompt) -> (embedding, reply, created)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def _embed(self, text):
+        vector = np.asarray(self.embed_fn(text), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _expire(self, now):
+        expired = [key for key, (_, _, created) in self._entries.items() if now - created > self.ttl]
+        for key in expired:
+            del self._entries[key]
+
+    def lookup(self, prompt: str, context_key: str = ""):
+        """Returns the cached reply for a similar prompt, or None."""
+        if not self.enabled:
+            return None
+
+        key = (context_key, normalize_prompt(prompt))
+        now = time.time()
+
+        with self._lock:
+            self._expire(now)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][1]
+            candidates = [(k, v) for k, v in self._entries.items() if k[0] == context_key]
+
+        if not candidates:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        embedding = self._embed(key[1])
+        matrix = np.stack([entry[0] for _, entry in candidates])
+        scores = matrix @ embedding
+        best = int(np.argmax(scores))
+
+        with self._lock:
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+            best_key, (_, reply, _) = candidates[best]
+            if best_key in self._entries:
+                self._entries.move_to_end(best_key)
+            self.hits += 1
+        print(f'Response cache hit ({scores[best]:.3f}): "{best_key[1]}"')
+        return reply
+
+    def store(self, prompt: str, reply: str, context_key: str = ""):
+        if not self.enabled or not reply:
+            return
+
+        key = (context_key, normalize_prompt(prompt))
+        embedding = self._embed(key[1])
+
+        with self._lock:
+            self._entries[key] = (embedding, reply, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        print('Response cache cleared.')
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
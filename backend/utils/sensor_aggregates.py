@@ -0,0 +1,216 @@
+import re
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+
+LOCAL_TZ = "Europe/Berlin"  # "today" / "yesterday" as the exhibit visitors mean it
+
+# Keywords (English + German) → the column they refer to. A column matches a key if
+# one of the words in its (lowercased) name starts with it, e.g. "Temp (°C)" → "temp".
+FIELD_KEYWORDS = {
+    "temp": ["temperature", "temperatur", "temp", "warm", "wärm", "kalt", "cold", "kält"],
+    "ph": ["ph", "säure", "acid"],
+    "do": ["oxygen", "sauerstoff", "dissolved"],
+    "ec": ["conductivity", "leitfähigkeit", "leitwert", "ec"],
+    "hum": ["humidity", "feuchte", "feuchtigkeit"],
+    "co2": ["co2", "carbon dioxide", "kohlendioxid"],
+}
+
+STAT_KEYWORDS = {
+    "min": ["lowest", "minimum", "minimal", "min", "coldest", "niedrigst", "tiefst", "kältest", "geringst"],
+    "max": ["highest", "maximum", "maximal", "max", "warmest", "hottest", "höchst", "wärmst", "heißest"],
+    "mean": ["average", "mean", "avg", "durchschnitt", "mittel"],
+    "trend": ["trend", "rising", "falling", "increasing", "decreasing", "changing", "steigt", "sinkt", "entwicklung", "verändert"],
+    "latest": ["current", "currently", "now", "latest", "right now", "today's", "aktuell", "jetzt", "gerade", "derzeit", "zurzeit", "momentan"],
+}
+
+WINDOW_KEYWORDS = {
+    "yesterday": ["yesterday", "gestern"],
+    "today": ["today", "heute"],
+    "week": ["week", "woche", "7 days", "7 tage", "sieben tage"],
+}
+
+# Questions we can't answer from the aggregates: leave those to the PandasQueryEngine
+UNSUPPORTED_KEYWORDS = [
+    "correlat", "compar", "vergleich", "between", "zwischen", "when", "wann", "how many", "how often",
+    "wie oft", "wie viele", "each", "every", "jede", "per hour", "pro stunde", "month", "monat", "year", "jahr",
+    "ago", "vor ", "last time", "since", "seit",
+]
+
+# Time expressions other than the WINDOW_KEYWORDS. A question naming one of these asks about
+# a period the aggregates don't cover, so it must not get the default window (or the latest reading).
+TIME_KEYWORDS = [
+    "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
+    "montag", "dienstag", "mittwoch", "donnerstag", "freitag", "samstag", "sonnabend", "sonntag",
+    "january", "february", "march", "april", "may", "june", "july", "august", "september", "october",
+    "november", "december", "januar", "februar", "märz", "mai", "juni", "juli", "oktober", "dezember",
+    "morning", "noon", "afternoon", "evening", "night", "midnight", "o'clock",
+    "morgen", "vormittag", "mittag", "nachmittag", "abend", "nacht", "mitternacht", "uhr",
+    "day before", "vorgestern", "weeks", "wochen", "fortnight", "days", "tage", "hour", "stunde",
+    "weekend", "lately", "kürzlich", "neulich",
+]
+# Numbers name dates, times or periods ("on 3 May", "at 14:00", "last 3 days"), except in these phrases
+KNOWN_NUMBER_PHRASES_RE = re.compile(r"\b(?:7|sieben) (?:days|tage)\b|\b24 ?(?:hours|stunden|h)\b")
+NUMBER_RE = re.compile(r"\b\d+\b")
+
+WORD_RE = re.compile(r"\w+")
+
+
+def normalize_text(text):
+    return str(text).lower().replace("₂", "2")
+
+
+def contains_keyword(text, keyword):
+    # Short keywords (ph, do, ec, min, max, ...) must be whole words, longer ones may be word prefixes
+    if len(keyword) <= 3:
+        return keyword in WORD_RE.findall(text)
+    return re.search(r"(?<![\w])" + re.escape(keyword), text) is not None
+
+
+def resolve_columns(columns):
+    """Maps each FIELD_KEYWORDS key to the matching DataFrame column."""
+    resolved = {}
+    for key in FIELD_KEYWORDS:
+        for col in columns:
+            words = WORD_RE.findall(normalize_text(col))
+            if any(w.startswith(key) for w in words):
+                resolved[key] = col
+                break
+    return resolved
+
+
+def summarize(frame, fields) -> dict:
+    """min / max (with timestamps), mean and count of each field in frame."""
+    summary = {}
+    for field in fields:
+        series = frame[field].dropna()
+        if series.empty:
+            continue
+        summary[field] = {
+            "min": series.min(), "min_at": series.idxmin(),
+            "max": series.max(), "max_at": series.idxmax(),
+            "mean": series.mean(), "count": len(series),
+        }
+    return summary
+
+
+def trend(series, now, hours=24):
+    """Slope of a linear fit over the `hours` before now (units per hour), or None."""
+    series = series.dropna()
+    series = series[series.index >= now - timedelta(hours=hours)]
+    if len(series) < 3:
+        return None
+    x = (series.index - series.index[0]).total_seconds() / 3600
+    return float(np.polyfit(x, series.values, 1)[0])
+
+
+class SensorAggregates:
+    """
+    Precomputed aggregates over a sensor DataFrame: the latest value of each
+    field, min/max/mean for the windows 'today', 'yesterday' and 'week'
+    (last 7 days), and the 24h trend per field. The windows are anchored on
+    the wall clock, so the sensor cache rebuilds them when new data arrives
+    and when the local day changes (see `today`).
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.columns = resolve_columns([c for c in df.columns if c not in ("created_at", "entry_id")])
+        fields = list(self.columns.values())
+
+        indexed = df.set_index(df["created_at"].dt.tz_convert(LOCAL_TZ))[fields].sort_index()
+        self.latest = {}
+        for field in fields:
+            series = indexed[field].dropna()
+            if not series.empty:
+                self.latest[field] = (series.iloc[-1], series.index[-1])
+
+        now = pd.Timestamp.now(tz=LOCAL_TZ)
+        today = self.today = now.normalize()
+        self.windows = {
+            "today": summarize(indexed[indexed.index >= today], fields),
+            "yesterday": summarize(indexed[(indexed.index >= today - timedelta(days=1)) & (indexed.index < today)], fields),
+            "week": summarize(indexed[indexed.index >= now - timedelta(days=7)], fields),
+        }
+        self.trends = {field: trend(indexed[field], now) for field in fields}
+
+
+def match_sensor_intent(query: str, aggregates: SensorAggregates):
+    """
+    Returns (column, stat, window) for simple metric/window questions such as
+    "What is the current water temperature?" or "Wie hoch war der pH-Wert gestern maximal?",
+    or None if the question needs a real analysis.
+    """
+    text = normalize_text(query)
+    if any(contains_keyword(text, k) for k in UNSUPPORTED_KEYWORDS):
+        return None
+    # Any other time expression means a period we have no aggregate for, and
+    # the defaults below (latest reading / last 7 days) would answer the wrong question
+    other_time = KNOWN_NUMBER_PHRASES_RE.sub(" ", text)
+    if NUMBER_RE.search(other_time) or any(contains_keyword(other_time, k) for k in TIME_KEYWORDS):
+        return None
+
+    keys = [key for key, words in FIELD_KEYWORDS.items() if any(contains_keyword(text, w) for w in words)]
+    # "do" is also an English verb, so only the upper-case abbreviation counts
+    if re.search(r"\bDO\b", query) and "do" not in keys:
+        keys.append("do")
+    if len(keys) != 1 or keys[0] not in aggregates.columns:
+        return None
+    column = aggregates.columns[keys[0]]
+
+    stats = [stat for stat, words in STAT_KEYWORDS.items() if any(contains_keyword(text, w) for w in words)]
+    windows = [window for window, words in WINDOW_KEYWORDS.items() if any(contains_keyword(text, w) for w in words)]
+    if len(windows) > 1:
+        return None
+    window = windows[0] if windows else None
+
+    stats = [s for s in stats if s != "latest"] or stats
+    if len(stats) > 1:
+        return None
+    stat = stats[0] if stats else ("latest" if window is None else None)
+    if stat is None:
+        return None
+    if stat in ("min", "max", "mean") and window is None:
+        window = "week"
+    if stat == "latest" and window not in (None, "today"):
+        return None
+    return column, stat, window
+
+
+def format_time(ts):
+    return ts.strftime("%d.%m.%Y %H:%M")
+
+
+def answer_from_aggregates(query: str, aggregates: SensorAggregates):
+    """Answers simple sensor questions directly. Returns None to fall back to the PandasQueryEngine."""
+    if aggregates is None:
+        return None
+    intent = match_sensor_intent(query, aggregates)
+    if intent is None:
+        return None
+    column, stat, window = intent
+    window_names = {"today": "today", "yesterday": "yesterday", "week": "over the last 7 days"}
+
+    if stat == "latest":
+        if column not in aggregates.latest:
+            return None
+        value, at = aggregates.latest[column]
+        return f"The latest {column} reading is {value:.2f} (measured {format_time(at)})."
+
+    if stat == "trend":
+        slope = aggregates.trends.get(column)
+        if slope is None:
+            return None
+        if round(slope, 3) == 0:
+            return f"{column} has been stable over the last 24 hours."
+        direction = "rising" if slope > 0 else "falling"
+        return f"{column} has been {direction} over the last 24 hours by about {abs(slope):.3f} per hour."
+
+    summary = aggregates.windows[window].get(column)
+    if summary is None:
+        return f"There are no {column} readings {window_names[window]}."
+    if stat == "mean":
+        return f"The average {column} {window_names[window]} was {summary['mean']:.2f} ({summary['count']} readings)."
+    word = "lowest" if stat == "min" else "highest"
+    return f"The {word} {column} reading {window_names[window]} was {summary[stat]:.2f} (measured {format_time(summary[stat + '_at'])})."
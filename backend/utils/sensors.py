@@ -0,0 +1,434 @@
+import os, json, sqlite3, threading, time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+import requests
+import pandas as pd
+from llama_index.core.base.response.schema import Response
+from llama_index.core.schema import QueryBundle
+from llama_index.experimental.query_engine import PandasQueryEngine
+from llama_index.experimental.query_engine.pandas.output_parser import PandasInstructionParser
+
+from .sensor_aggregates import SensorAggregates, answer_from_aggregates, LOCAL_TZ
+from .response_cache import normalize_prompt
+
+
+# 1) Fetch & normalize your ThingSpeak data
+THINGSPEAK_FEEDS_URL = "https://api.thingspeak.com/channels/2974588/feeds.json"
+THINGSPEAK_URL = THINGSPEAK_FEEDS_URL + "?results=100"
+THINGSPEAK_PAGE_SIZE = 8000  # max results ThingSpeak returns per request
+FIELDS = [f"field{i}" for i in range(1, 7)]
+
+SENSOR_DB_PATH = os.getenv("LAHN_SENSOR_DB", "./sensor_history/lahn_sensors.sqlite")
+SENSOR_REFRESH_INTERVAL = float(os.getenv("LAHN_SENSOR_REFRESH_INTERVAL", "60"))  # seconds
+SENSOR_WINDOW_DAYS = float(os.getenv("LAHN_SENSOR_WINDOW_DAYS", "14"))  # history kept in memory
+
+
+def fetch_thingspeak(params) -> dict:
+    resp = requests.get(THINGSPEAK_FEEDS_URL, params=params, timeout=60)
+    resp.raise_for_status()
+    return resp.json()
+
+
+def thingspeak_time(ts: int) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def to_epoch(value) -> int:
+    # naive datetimes are taken as UTC, like ThingSpeak's created_at
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is None:
+        ts = ts.tz_localize("UTC")
+    return int(ts.timestamp())
+
+
+def to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class SensorHistoryStore:
+    """
+    Local SQLite copy of the full ThingSpeak channel history, indexed on time.
+    backfill() pages backwards through the channel until the first reading,
+    update() fetches the readings newer than the newest stored one, and load()
+    returns any time window as a DataFrame without touching the network.
+    """
+
+    def __init__(self, path=SENSOR_DB_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._write_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS readings ("
+                "entry_id INTEGER PRIMARY KEY, created_at INTEGER NOT NULL, "
+                + ", ".join(f"{f} REAL" for f in FIELDS) + ")"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS readings_created_at ON readings(created_at)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _get_meta(self, key):
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, conn, key, value):
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    @property
+    def field_map(self) -> dict:
+        # field1 → pH, DO (mg/L), etc. (from the channel metadata)
+        stored = self._get_meta("field_map")
+        return json.loads(stored) if stored else {}
+
+    def _bounds(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT MIN(created_at), MAX(created_at), COUNT(*) FROM readings").fetchone()
+
+    def _insert(self, data) -> int:
+        rows = []
+        for feed in data["feeds"]:
+            created_at = datetime.fromisoformat(feed["created_at"].replace("Z", "+00:00"))
+            rows.append((feed["entry_id"], int(created_at.timestamp()), *(to_float(feed.get(f)) for f in FIELDS)))
+
+        with self._write_lock, self._connect() as conn:
+            channel_meta = data["channel"]
+            self._set_meta(conn, "field_map", json.dumps({f: channel_meta[f] for f in FIELDS}))
+            before = conn.total_changes
+            conn.executemany(
+                f"INSERT OR IGNORE INTO readings (entry_id, created_at, {', '.join(FIELDS)}) "
+                f"VALUES ({', '.join('?' * (len(FIELDS) + 2))})",
+                rows,
+            )
+            return conn.total_changes - before
+
+    def _newest_entry_id(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT MAX(entry_id) FROM readings").fetchone()[0]
+
+    def update(self) -> int:
+        """
+        Stores the readings newer than the newest stored one. Returns the number of new rows.
+        ThingSpeak returns the *latest* page of a range, so after an outage longer than one
+        page this pages backwards with end= until it reaches the stored readings.
+        """
+        _, newest, _ = self._bounds()
+        newest_id = self._newest_entry_id()
+        params = {"results": THINGSPEAK_PAGE_SIZE}
+        if newest is not None:
+            # start is inclusive, duplicates are ignored on entry_id
+            params.update(start=thingspeak_time(newest), timezone="Etc/UTC")
+        added = 0
+        while True:
+            data = fetch_thingspeak(params)
+            added += self._insert(data)
+            feeds = data["feeds"]
+            if newest is None or len(feeds) < THINGSPEAK_PAGE_SIZE or feeds[0]["entry_id"] <= newest_id:
+                break
+            oldest = datetime.fromisoformat(feeds[0]["created_at"].replace("Z", "+00:00"))
+            params["end"] = thingspeak_time(int(oldest.timestamp()) - 1)
+        if added:
+            print(f'Stored {added} new Lahn sensor readings.')
+        return added
+
+    def backfill(self):
+        """Pages backwards through the channel history until the first reading is stored."""
+        if self._get_meta("backfill_complete") == "1":
+            return
+        print('Backfilling Lahn sensor history...')
+        while True:
+            oldest, _, count = self._bounds()
+            params = {"results": THINGSPEAK_PAGE_SIZE}
+            if oldest is not None:
+                params.update(end=thingspeak_time(oldest - 1), timezone="Etc/UTC")
+            data = fetch_thingspeak(params)
+            self._insert(data)
+            if len(data["feeds"]) < THINGSPEAK_PAGE_SIZE:
+                break
+        with self._write_lock, self._connect() as conn:
+            self._set_meta(conn, "backfill_complete", "1")
+        print(f'Lahn sensor history complete ({self._bounds()[2]} readings).')
+
+    def is_empty(self) -> bool:
+        return self._bounds()[2] == 0
+
+    def load(self, start=None, end=None, limit=None) -> pd.DataFrame:
+        """
+        Returns the readings with start <= created_at < end (both optional,
+        datetimes or anything pd.Timestamp accepts), oldest first. With limit,
+        only the most recent `limit` readings of that window are returned.
+        """
+        where, params = [], []
+        if start is not None:
+            where.append("created_at >= ?")
+            params.append(to_epoch(start))
+        if end is not None:
+            where.append("created_at < ?")
+            params.append(to_epoch(end))
+        sql = f"SELECT created_at, entry_id, {', '.join(FIELDS)} FROM readings"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY created_at DESC"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+
+        with self._connect() as conn:
+            df = pd.read_sql_query(sql, conn, params=params)
+
+        df = df.iloc[::-1].reset_index(drop=True)
+        df["created_at"] = pd.to_datetime(df["created_at"], unit="s", utc=True)
+        # rename columns to pH, DO (mg/L), etc.
+        return df.rename(columns=self.field_map)
+
+
+history_store = SensorHistoryStore()
+
+
+def fetch_lahn_sensors_df(start=None, end=None, results=100) -> pd.DataFrame:
+    """
+    Loads sensor readings from the local history store. Without a time window
+    this returns the latest `results` readings, like the old feeds.json?results=100 call.
+    """
+    if history_store.is_empty():
+        print('Fetching Lahn sensor data...')
+        history_store.update()
+    return history_store.load(start, end, limit=None if (start or end) else results)
+
+
+class SensorDataCache:
+    """
+    Keeps the last window_days of sensor readings as an in-memory DataFrame.
+    A background thread appends new ThingSpeak readings to the history store
+    every refresh_interval seconds (only entries newer than the last stored one),
+    backfills the full history once, and swaps in the updated frame. Readers get
+    the current frame without waiting on the network (except for the very first
+    call, which has nothing to serve yet).
+    """
+
+    def __init__(self, store=history_store, refresh_interval=SENSOR_REFRESH_INTERVAL, window_days=SENSOR_WINDOW_DAYS):
+        self.store = store
+        self.refresh_interval = refresh_interval
+        self.window_days = window_days
+        self._df = None
+        self._aggregates = None
+        self._lock = threading.Lock()
+        self._init_lock = threading.Lock()
+        self._thread = None
+        self.last_refresh = None
+
+    def refresh(self):
+        """Fetches new readings and swaps in the updated frame (and aggregates)."""
+        added = self.store.update()
+        # The aggregate windows (today, yesterday, ...) move at midnight even without new readings
+        new_day = self._aggregates is not None and self._aggregates.today != pd.Timestamp.now(tz=LOCAL_TZ).normalize()
+        if self._df is not None and not added and not new_day:
+            self.last_refresh = time.time()
+            return
+
+        cutoff = datetime.now(timezone.utc) - timedelta(days=self.window_days)
+        new_df = self.store.load(start=cutoff)
+        if new_df.empty:
+            # Channel has been quiet for a while, fall back to the latest readings
+            new_df = self.store.load(limit=100)
+
+        aggregates = None
+        try:
+            aggregates = SensorAggregates(new_df)
+        except Exception as e:
+            print("❌ Failed to compute sensor aggregates:", e)
+
+        with self._lock:
+            self._df = new_df
+            self._aggregates = aggregates
+            self.last_refresh = time.time()
+
+    def _run(self):
+        try:
+            self.refresh()
+            self.store.backfill()
+        except Exception as e:
+            print("❌ Sensor history backfill failed:", e)
+        while True:
+            time.sleep(self.refresh_interval)
+            try:
+                self.refresh()
+            except Exception as e:
+                # Keep serving the last good frame
+                print("❌ Sensor data refresh failed:", e)
+
+    def start(self):
+        """Starts the background refresh (the first refresh and the backfill run right away)."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="sensor-refresh", daemon=True)
+            self._thread.start()
+
+    def get(self) -> pd.DataFrame:
+        """Returns the current frame. Treat it as read-only, it is shared between requests."""
+        if self._df is None:
+            with self._init_lock:
+                if self._df is None:
+                    self.start()
+                    self.refresh()
+        return self._df
+
+    def aggregates(self):
+        """Returns the SensorAggregates of the current frame (None if they could not be computed)."""
+        self.get()
+        return self._aggregates
+
+
+sensor_cache = SensorDataCache()
+
+
+class CachedPandasQueryEngine(PandasQueryEngine):
+    """
+    PandasQueryEngine meant to live as long as the server:
+    - set_df() swaps in new data atomically (queries in flight keep the frame they started with)
+    - every query runs its generated code on its own copy of the frame, so code that
+      modifies it (dropna(inplace=True), new columns, ...) can't leak into other answers
+    - the pandas code generated for a question is cached per normalised question and
+      local day, so asking it again skips the code-generation LLM call and only re-runs
+      the code. The day is part of the key because the generated code may hard-code
+      dates for "today", "yesterday" etc.
+    """
+
+    def __init__(self, df: pd.DataFrame, output_kwargs=None, max_cached_code=256, **kwargs):
+        super().__init__(df=df, output_kwargs=output_kwargs, **kwargs)
+        self._output_kwargs = output_kwargs or {}
+        self._max_cached_code = max_cached_code
+        self._code_cache = OrderedDict()
+        self._code_lock = threading.Lock()
+        self.set_df(df)
+
+    def set_df(self, df: pd.DataFrame):
+        # (frame, table context for the prompt) are swapped as one
+        self._state = (df, str(df.head(self._head)))
+        self._df = df
+
+    def _cached_code(self, key):
+        with self._code_lock:
+            code = self._code_cache.get(key)
+            if code is not None:
+                self._code_cache.move_to_end(key)
+            return code
+
+    def _store_code(self, key, code):
+        with self._code_lock:
+            self._code_cache[key] = code
+            self._code_cache.move_to_end(key)
+            while len(self._code_cache) > self._max_cached_code:
+                self._code_cache.popitem(last=False)
+
+    # Mirrors PandasQueryEngine._query (and its private attributes) as of
+    # llama-index-experimental 0.5.x; re-check this override when upgrading it.
+    def _query(self, query_bundle: QueryBundle) -> Response:
+        df, table_context = self._state
+        key = (pd.Timestamp.now(tz=LOCAL_TZ).date(), normalize_prompt(query_bundle.query_str))
+
+        pandas_response_str = self._cached_code(key)
+        if pandas_response_str is None:
+            pandas_response_str = self._llm.predict(
+                self._pandas_prompt,
+                df_str=table_context,
+                query_str=query_bundle.query_str,
+                instruction_str=self._instruction_str,
+            )
+            cached = False
+        else:
+            print('Reusing cached pandas code.')
+            cached = True
+
+        if self._verbose:
+            print(f"> Pandas Instructions:\n```\n{pandas_response_str}\n```\n")
+        pandas_output = PandasInstructionParser(df.copy(), self._output_kwargs).parse(pandas_response_str)
+        if self._verbose:
+            print(f"> Pandas Output: {pandas_output}\n")
+
+        if "There was an error running the output as Python code" in str(pandas_output):
+            # don't keep code that failed, it will be regenerated next time
+            if cached:
+                with self._code_lock:
+                    self._code_cache.pop(key, None)
+        elif not cached:
+            self._store_code(key, pandas_response_str)
+
+        response_metadata = {
+            "pandas_instruction_str": pandas_response_str,
+            "raw_pandas_output": pandas_output,
+        }
+        if self._synthesize_response:
+            response_str = str(
+                self._llm.predict(
+                    self._response_synthesis_prompt,
+                    query_str=query_bundle.query_str,
+                    pandas_instructions=pandas_response_str,
+                    pandas_output=pandas_output,
+                )
+            )
+        else:
+            response_str = str(pandas_output)
+
+        return Response(response=response_str, metadata=response_metadata)
+
+
+# 2) Wrap it in a callable that runs a PandasQueryEngine on the cached data
+class LahnSensorsTool:
+    name = "lahn_sensors"
+    description = (
+        "You can access your (the Lahn river's) temperature, CO3 and other live readings here. **Always use this tool for any question about historical, recent or current sensor data.**\n"
+        "This is the single source of truth for live river readings (pH, DO, Temp, EC, Humidity, CO₂).\n"
+        "Some questions require analysis of the data. For example: What was the lowest temperature reading last week?"
+        "Such questions require you to not just access the relevant data range, but perform a computation on it. Do what is neccessary on the data, to obtain a response to the question."
+        "Input: a natural-language question about live Lahn Atlas sensor values.\n"
+        "Output: a concise natural-language answer based on the fetched data and an analysis of it."
+        "Use this to answer analytical questions about the live Lahn Atlas sensor data "
+        "(pH, DO, Temp, EC, Humidity, CO2) fetched from the ThingSpeak REST API."
+    )
+
+    def __init__(self, llm, cache=sensor_cache):
+        # store whichever LLM you pass in (e.g. get_llm("mistral-large-instruct"))
+        self.llm = llm
+        self.cache = cache
+        self._engine = None
+        self._engine_source = None
+        self._engine_lock = threading.Lock()
+
+    def _get_engine(self) -> CachedPandasQueryEngine:
+        """The long-lived engine, pointed at the cache's current frame."""
+        df = self.cache.get()
+        with self._engine_lock:
+            if self._engine is None:
+                self._engine = CachedPandasQueryEngine(
+                    df=df,                     # each query runs on its own copy
+                    llm=self.llm,              # or your preferred LLM wrapper
+                    verbose=os.getenv("LAHN_SENSOR_VERBOSE") == "1",  # shows generated pandas code
+                    synthesize_response=True,  # narrative answer
+                )
+            elif df is not self._engine_source:
+                self._engine.set_df(df)
+            self._engine_source = df
+            return self._engine
+
+    def __call__(self, query: str) -> str:
+        print('Calling Lahn Sensors Tool...')
+        # common metric/window questions are answered from the precomputed aggregates
+        answer = answer_from_aggregates(query, self.cache.aggregates())
+        if answer is not None:
+            print('Answered from sensor aggregates:', answer)
+            return answer
+        # run the query on the cached data & return the natural‐language result
+        result = self._get_engine().query(query)
+        return result.response
+
+    def query(self, query_str: str) -> str:
+        """
+        Alias so that QueryEngineTool can call .query(...)
+        under the hood. Simply forwards to __call__.
+        """
+        return self(query_str)
@@ -0,0 +1,152 @@
+import os, sqlite3, threading, time, uuid
+from collections import OrderedDict
+
+from .utils import format_history_as_string
+
+
+CHAT_MAX_SESSIONS = int(os.getenv("CHAT_MAX_SESSIONS", "512"))
+# Empty: sessions live in memory only. Otherwise evicted sessions (and restarts) are restored from here.
+CHAT_SESSION_DB = os.getenv("CHAT_SESSION_DB", "")
+
+
+class ChatSession:
+    """
+    One conversation held on the server. Besides the raw messages (in the
+    client's {"sender", "text"} format) it keeps the prompt fragments derived
+    from them, extended message by message instead of rebuilt every request:
+    the chat completion messages and the formatted transcript lines.
+    """
+
+    def __init__(self, session_id, created=None):
+        self.id = session_id
+        self.created = created or time.time()
+        self.updated = self.created
+        self.messages = []
+        self.chat_messages = []
+        self.history_lines = []
+        # Debate summary and how many messages it covers, see server.prepare_debate_summary
+        self.debate_summary = ""
+        self.summarized_upto = 0
+        self.lock = threading.Lock()
+
+    def add(self, sender, text):
+        message = {"sender": sender, "text": text}
+        self.messages.append(message)
+        self.chat_messages.append({'role': "user" if sender == "user" else "assistant", 'content': text})
+        self.history_lines.append(format_history_as_string([message]))
+        self.updated = time.time()
+        return message
+
+    def history_string(self):
+        return "\n".join(self.history_lines)
+
+
+class SessionExpired(Exception):
+    """Raised for a session_id the server doesn't know (any more): evicted, lost on restart or never issued."""
+
+
+class SessionStore:
+    """
+    In-memory LRU of ChatSessions keyed by session id, optionally backed by
+    SQLite (CHAT_SESSION_DB) so sessions survive eviction and restarts.
+    Session ids are only issued here: new() hands out a session that is kept
+    once its first turn is added with append_turn().
+    """
+
+    def __init__(self, max_sessions=CHAT_MAX_SESSIONS, db_path=CHAT_SESSION_DB):
+        self.max_sessions = max_sessions
+        self.db_path = db_path or None
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        if self.db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            with self._connect() as conn:
+                conn.execute("CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, created REAL, updated REAL)")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS messages (session_id TEXT, position INTEGER, sender TEXT, text TEXT, "
+                    "PRIMARY KEY (session_id, position))"
+                )
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS debate_summaries (session_id TEXT PRIMARY KEY, summary TEXT, summarized_upto INTEGER)"
+                )
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _load(self, session_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT created FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            if row is None:
+                return None
+            messages = conn.execute(
+                "SELECT sender, text FROM messages WHERE session_id = ? ORDER BY position", (session_id,)
+            ).fetchall()
+            summary = conn.execute(
+                "SELECT summary, summarized_upto FROM debate_summaries WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        session = ChatSession(session_id, created=row[0])
+        for sender, text in messages:
+            session.add(sender, text)
+        if summary is not None:
+            session.debate_summary, session.summarized_upto = summary
+        return session
+
+    def _keep(self, session):
+        # caller holds self.lock
+        self.sessions[session.id] = session
+        self.sessions.move_to_end(session.id)
+        while len(self.sessions) > self.max_sessions:
+            self.sessions.popitem(last=False)
+
+    def new(self, history=()):
+        """A session with a fresh id, optionally seeded with earlier {"sender", "text"} messages. Not stored yet."""
+        session = ChatSession(uuid.uuid4().hex)
+        for message in history:
+            session.add(message["sender"], message["text"])
+        return session
+
+    def get(self, session_id):
+        """Returns the session with this id. Raises SessionExpired if it is unknown."""
+        with self.lock:
+            session = self.sessions.get(session_id)
+            if session is None and self.db_path:
+                session = self._load(session_id)
+            if session is None:
+                raise SessionExpired(f"Session {session_id} has expired. Start a new conversation or resend its history.")
+            self._keep(session)
+            return session
+
+    def append_turn(self, session, prompt, reply):
+        """Adds the visitor's prompt (if any) and the avatar's reply as one step, and keeps the session."""
+        turn = ([("user", prompt)] if prompt else []) + [("avatar", reply)]
+        with self.lock:
+            known = session.id in self.sessions
+            self._keep(session)
+        with session.lock:
+            # A session that isn't in memory (new, or evicted while the turn ran) is written in full
+            start = len(session.messages) if known else 0
+            for sender, text in turn:
+                session.add(sender, text)
+            rows = [(session.id, position, m["sender"], m["text"])
+                    for position, m in enumerate(session.messages[start:], start)]
+        if self.db_path:
+            with self._write_lock, self._connect() as conn:
+                conn.execute("INSERT OR IGNORE INTO sessions (id, created, updated) VALUES (?, ?, ?)",
+                             (session.id, session.created, session.updated))
+                conn.executemany("INSERT OR REPLACE INTO messages (session_id, position, sender, text) VALUES (?, ?, ?, ?)", rows)
+                conn.execute("UPDATE sessions SET updated = ? WHERE id = ?", (session.updated, session.id))
+
+    def set_debate_summary(self, session, summary, upto):
+        """Records that summary covers session.messages[:upto] (ignored if a newer summary exists)."""
+        with session.lock:
+            if upto < session.summarized_upto:
+                return
+            session.debate_summary, session.summarized_upto = summary, upto
+        if self.db_path:
+            with self._write_lock, self._connect() as conn:
+                conn.execute("INSERT OR REPLACE INTO debate_summaries (session_id, summary, summarized_upto) VALUES (?, ?, ?)",
+                             (session.id, summary, upto))
+
+
+session_store = SessionStore()
@@ -0,0 +1,79 @@
+import threading, time
+
+
+class NotReady(Exception):
+    """Raised when a component is still loading (or failed to load)."""
+
+
+class StartupLoader:
+    """
+    Loads the slow parts of the server (Whisper, embedder, index, ...) in
+    background threads so the HTTP server can bind right away. Components
+    start in parallel unless they name other components in `after`.
+    Request handlers call wait_for(name) for what they need; /api/ready
+    exposes report() with the per-component timing breakdown.
+    """
+
+    def __init__(self):
+        self.components = {}
+        self.started_at = time.time()
+
+    def add(self, name, loader, after=()):
+        self.components[name] = {
+            "loader": loader,
+            "after": tuple(after),
+            "event": threading.Event(),
+            "status": "pending",
+            "value": None,
+            "error": None,
+            "seconds": None,
+        }
+
+    def _load(self, name):
+        component = self.components[name]
+        try:
+            for dependency in component["after"]:
+                self.wait_for(dependency)
+            component["status"] = "loading"
+            start = time.time()
+            print(f"🔄 Loading {name}...")
+            component["value"] = component["loader"]()
+            component["seconds"] = round(time.time() - start, 2)
+            component["status"] = "ready"
+            print(f"✅ {name} ready after {component['seconds']} s.")
+        except Exception as e:
+            component["status"] = "failed"
+            component["error"] = str(e)
+            print(f"❌ Failed to load {name}:", e)
+        finally:
+            component["event"].set()
+            if self.ready():
+                print(f"✅ Startup complete after {time.time() - self.started_at:.1f} s:",
+                      {n: c["seconds"] for n, c in self.components.items()})
+
+    def start(self):
+        for name in self.components:
+            threading.Thread(target=self._load, args=(name,), name=f"startup-{name}", daemon=True).start()
+
+    def wait_for(self, name, timeout=None):
+        """Blocks until the component is loaded and returns its value."""
+        component = self.components[name]
+        if not component["event"].wait(timeout):
+            raise NotReady(f"{name} is still loading")
+        if component["status"] != "ready":
+            raise NotReady(f"{name} failed to load: {component['error']}")
+        return component["value"]
+
+    def ready(self, names=None) -> bool:
+        names = names or self.components
+        return all(self.components[n]["status"] == "ready" for n in names)
+
+    def report(self) -> dict:
+        return {
+            "ready": self.ready(),
+            "uptime": round(time.time() - self.started_at, 1),
+            "components": {
+                name: {"status": c["status"], "seconds": c["seconds"], "error": c["error"]}
+                for name, c in self.components.items()
+            },
+        }
@@ -0,0 +1,204 @@
+import os, threading, queue, time
+from concurrent.futures import Future
+
+import numpy as np
+import torch
+
+
+# 'transformers':      openai/whisper-small through transformers, fp32 (the original path)
+# 'transformers-int8': same model with its Linear layers dynamically quantised to int8 (CPU)
+# 'onnx':              ONNX Runtime export through optimum (pip install optimum[onnxruntime])
+# 'ctranslate2':       faster-whisper / CTranslate2 with int8 weights (pip install faster-whisper)
+TRANSCRIPTION_BACKEND = os.getenv("TRANSCRIPTION_BACKEND", "transformers")
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "openai/whisper-small")
+# Visitors speak German, pinning the language skips Whisper's language detection
+TRANSCRIPTION_LANGUAGE = os.getenv("TRANSCRIPTION_LANGUAGE", "de")
+TARGET_SR = 16000
+# Micro-batching: concurrent utterances wait up to this long to share one generate() call (0 disables)
+TRANSCRIPTION_BATCH_WINDOW_MS = float(os.getenv("TRANSCRIPTION_BATCH_WINDOW_MS", "30"))
+TRANSCRIPTION_MAX_BATCH = int(os.getenv("TRANSCRIPTION_MAX_BATCH", "8"))
+
+whisper_device = "cuda" if torch.cuda.is_available() else "cpu"
+
+
+class TransformersWhisper:
+    """Whisper through transformers' generate(). quantize=True applies int8 dynamic quantisation."""
+
+    def __init__(self, model_name=WHISPER_MODEL, language=TRANSCRIPTION_LANGUAGE, quantize=False, onnx=False):
+        from transformers import WhisperProcessor
+
+        self.language = language
+        self.processor = WhisperProcessor.from_pretrained(model_name)
+
+        if onnx:
+            from optimum.onnxruntime import ORTModelForSpeechSeq2Seq
+            self.device = "cpu"
+            self.model = ORTModelForSpeechSeq2Seq.from_pretrained(model_name, export=True)
+        else:
+            from transformers import WhisperForConditionalGeneration
+            self.device = "cpu" if quantize else whisper_device
+            model = WhisperForConditionalGeneration.from_pretrained(model_name).eval()
+            if quantize:
+                model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            self.model = model.to(self.device)
+
+    def _generate_kwargs(self):
+        if self.language is None:
+            return {}
+        return {"language": self.language, "task": "transcribe"}
+
+    def transcribe_batch(self, audios, sampling_rate=TARGET_SR):
+        input_features = self.processor(
+            [np.asarray(a, dtype=np.float32) for a in audios], sampling_rate=sampling_rate, return_tensors="pt"
+        ).input_features.to(self.device)
+        with torch.inference_mode():
+            predicted_ids = self.model.generate(input_features, **self._generate_kwargs())
+        return [t.strip() for t in self.processor.batch_decode(predicted_ids, skip_special_tokens=True)]
+
+    def transcribe(self, audio, sampling_rate=TARGET_SR):
+        return self.transcribe_batch([audio], sampling_rate)[0]
+
+
+class CTranslate2Whisper:
+    """Whisper through faster-whisper (CTranslate2), int8 weights by default."""
+
+    def __init__(self, model_size=None, language=TRANSCRIPTION_LANGUAGE, compute_type=None):
+        from faster_whisper import WhisperModel
+
+        self.language = language
+        model_size = model_size or WHISPER_MODEL.split("whisper-")[-1]  # "openai/whisper-small" → "small"
+        compute_type = compute_type or ("int8_float16" if whisper_device == "cuda" else "int8")
+        self.model = WhisperModel(model_size, device=whisper_device, compute_type=compute_type)
+
+    def transcribe(self, audio, sampling_rate=TARGET_SR):
+        if sampling_rate != TARGET_SR:
+            raise ValueError(f"CTranslate2Whisper expects {TARGET_SR} Hz audio")
+        segments, _ = self.model.transcribe(
+            np.asarray(audio, dtype=np.float32), language=self.language, beam_size=1, task="transcribe"
+        )
+        return " ".join(s.text.strip() for s in segments).strip()
+
+    def transcribe_batch(self, audios, sampling_rate=TARGET_SR):
+        return [self.transcribe(a, sampling_rate) for a in audios]
+
+
+class BatchingTranscriber:
+    """
+    Micro-batching scheduler in front of a transcriber. Callers block in
+    transcribe() while a scheduler thread collects requests for up to
+    window_ms (or max_batch clips) and runs them as one padded batch.
+    Each caller gets its own transcript back; stats() reports batch sizes
+    and queue wait times.
+    """
+
+    def __init__(self, transcriber, window_ms=TRANSCRIPTION_BATCH_WINDOW_MS, max_batch=TRANSCRIPTION_MAX_BATCH):
+        self.transcriber = transcriber
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.requests = queue.Queue()
+        self.metrics_lock = threading.Lock()
+        self.metrics = {"batches": 0, "clips": 0, "max_batch_size": 0, "queue_wait_total": 0.0,
+                        "queue_wait_max": 0.0, "inference_total": 0.0}
+        threading.Thread(target=self._run, name="whisper-batcher", daemon=True).start()
+
+    def submit(self, audio, sampling_rate=TARGET_SR) -> Future:
+        future = Future()
+        self.requests.put((np.asarray(audio, dtype=np.float32), sampling_rate, time.perf_counter(), future))
+        return future
+
+    def transcribe(self, audio, sampling_rate=TARGET_SR):
+        return self.submit(audio, sampling_rate).result()
+
+    def transcribe_batch(self, audios, sampling_rate=TARGET_SR):
+        futures = [self.submit(a, sampling_rate) for a in audios]
+        return [f.result() for f in futures]
+
+    def _collect(self):
+        batch = [self.requests.get()]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            # One generate() call per sampling rate (in practice everything is 16 kHz)
+            by_rate = {}
+            for item in batch:
+                by_rate.setdefault(item[1], []).append(item)
+            for sampling_rate, items in by_rate.items():
+                try:
+                    transcripts = self.transcriber.transcribe_batch([i[0] for i in items], sampling_rate)
+                    for item, transcript in zip(items, transcripts):
+                        item[3].set_result(transcript)
+                except Exception as e:
+                    for item in items:
+                        item[3].set_exception(e)
+            self._record(batch, started, time.perf_counter() - started)
+
+    def _record(self, batch, started, inference_seconds):
+        waits = [started - item[2] for item in batch]
+        with self.metrics_lock:
+            m = self.metrics
+            m["batches"] += 1
+            m["clips"] += len(batch)
+            m["max_batch_size"] = max(m["max_batch_size"], len(batch))
+            m["queue_wait_total"] += sum(waits)
+            m["queue_wait_max"] = max(m["queue_wait_max"], max(waits))
+            m["inference_total"] += inference_seconds
+
+    def stats(self) -> dict:
+        with self.metrics_lock:
+            m = dict(self.metrics)
+        batches, clips = m["batches"] or 1, m["clips"] or 1
+        return {
+            "batches": m["batches"],
+            "clips": m["clips"],
+            "queued": self.requests.qsize(),
+            "avg_batch_size": round(m["clips"] / batches, 2),
+            "max_batch_size": m["max_batch_size"],
+            "avg_queue_wait_ms": round(1000 * m["queue_wait_total"] / clips, 1),
+            "max_queue_wait_ms": round(1000 * m["queue_wait_max"], 1),
+            "avg_batch_seconds": round(m["inference_total"] / batches, 3),
+        }
+
+
+def load_transcriber(backend=TRANSCRIPTION_BACKEND, **kwargs):
+    print(f"🔄 Loading Whisper ({backend}) on {whisper_device}...")
+    if backend == "transformers":
+        transcriber = TransformersWhisper(**kwargs)
+    elif backend == "transformers-int8":
+        transcriber = TransformersWhisper(quantize=True, **kwargs)
+    elif backend == "onnx":
+        transcriber = TransformersWhisper(onnx=True, **kwargs)
+    elif backend == "ctranslate2":
+        transcriber = CTranslate2Whisper(**kwargs)
+    else:
+        raise ValueError(f"Unknown TRANSCRIPTION_BACKEND: {backend}")
+    print("✅ Whisper model loaded.")
+    return transcriber
+
+
+_transcriber = None
+_transcriber_lock = threading.Lock()
+
+
+def get_transcriber():
+    """Loads the configured backend on first use (or when the server preloads it)."""
+    global _transcriber
+    if _transcriber is None:
+        with _transcriber_lock:
+            if _transcriber is None:
+                transcriber = load_transcriber()
+                if TRANSCRIPTION_BATCH_WINDOW_MS > 0:
+                    transcriber = BatchingTranscriber(transcriber)
+                _transcriber = transcriber
+    return _transcriber
@@ -0,0 +1,132 @@
+import os, queue, threading, time, uuid
+
+from .audio import decode_audio, TARGET_SR
+from .transcription import get_transcriber
+
+
+TRANSCRIPTION_WORKERS = int(os.getenv("TRANSCRIPTION_WORKERS", "1"))
+TRANSCRIPTION_QUEUE_SIZE = int(os.getenv("TRANSCRIPTION_QUEUE_SIZE", "64"))
+TRANSCRIPTION_BATCH_SIZE = int(os.getenv("TRANSCRIPTION_BATCH_SIZE", "4"))
+TRANSCRIPTION_JOB_TTL = int(os.getenv("TRANSCRIPTION_JOB_TTL", "3600"))  # seconds finished jobs stay queryable
+
+
+class TranscriptionQueue:
+    """
+    Bounded background queue for transcribing uploaded recordings. submit()
+    returns a job id right away; worker threads drain up to batch_size pending
+    clips at a time and run them through the transcriber as one batch.
+    on_done(transcript) runs on the worker once a job has finished.
+    """
+
+    def __init__(self, workers=TRANSCRIPTION_WORKERS, max_pending=TRANSCRIPTION_QUEUE_SIZE,
+                 batch_size=TRANSCRIPTION_BATCH_SIZE, job_ttl=TRANSCRIPTION_JOB_TTL):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.job_ttl = job_ttl
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.started = False
+
+    def start(self):
+        if self.started:
+            return
+        self.started = True
+        for i in range(self.workers):
+            threading.Thread(target=self._run, name=f"transcription-{i}", daemon=True).start()
+
+    def submit(self, audio, on_done=None) -> str:
+        """Enqueues audio (bytes or path). Raises queue.Full when the queue is at capacity."""
+        self.start()
+        job_id = uuid.uuid4().hex
+        job = {"status": "queued", "transcript": None, "error": None,
+               "submitted": time.time(), "finished": None}
+        with self.lock:
+            self._prune()
+            self.jobs[job_id] = job
+        try:
+            self.pending.put_nowait((job_id, audio, on_done))
+        except queue.Full:
+            with self.lock:
+                del self.jobs[job_id]
+            raise
+        return job_id
+
+    def status(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            return {"job_id": job_id, "position": self._position(job_id), **job}
+
+    def _position(self, job_id):
+        if self.jobs[job_id]["status"] != "queued":
+            return None
+        with self.pending.mutex:
+            for i, item in enumerate(self.pending.queue):
+                if item[0] == job_id:
+                    return i
+        return 0
+
+    def _prune(self):
+        now = time.time()
+        expired = [j for j, job in self.jobs.items() if job["finished"] and now - job["finished"] > self.job_ttl]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+    def _finish(self, job_id, transcript=None, error=None):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return
+            job["status"] = "failed" if error else "done"
+            job["transcript"] = transcript
+            job["error"] = error
+            job["finished"] = time.time()
+
+    def _next_batch(self):
+        batch = [self.pending.get()]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.pending.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            decoded = []
+            for job_id, audio, on_done in batch:
+                with self.lock:
+                    if job_id in self.jobs:
+                        self.jobs[job_id]["status"] = "running"
+                try:
+                    decoded.append((job_id, decode_audio(audio, TARGET_SR), on_done))
+                except Exception as e:
+                    print("❌ Failed to decode upload:", e)
+                    self._finish(job_id, error=str(e))
+            if not decoded:
+                continue
+
+            try:
+                start = time.time()
+                transcripts = get_transcriber().transcribe_batch([a for _, a, _ in decoded], TARGET_SR)
+                print(f"📝 Transcribed {len(decoded)} upload(s) in {time.time() - start:.1f} s.")
+            except Exception as e:
+                print("❌ Failed to transcribe:", e)
+                for job_id, _, _ in decoded:
+                    self._finish(job_id, error=str(e))
+                continue
+
+            for (job_id, _, on_done), transcript in zip(decoded, transcripts):
+                try:
+                    if on_done is not None:
+                        on_done(transcript)
+                    self._finish(job_id, transcript=transcript)
+                except Exception as e:
+                    print("❌ Failed to store transcript:", e)
+                    self._finish(job_id, error=str(e))
+
+
+transcription_queue = TranscriptionQueue()
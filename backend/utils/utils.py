@@ -2,99 +2,23 @@
 import numpy as np
 
 import soundfile as sf
-import torch, torchaudio
-import subprocess
-from transformers import WhisperProcessor, WhisperForConditionalGeneration
 
 
-import os, io, shutil
-from openai import AzureOpenAI, AsyncAzureOpenAI
+import os, io, asyncio
+from openai import AsyncAzureOpenAI
 import base64
 
 from dotenv import load_dotenv
 from typing import Any, List
 
 
-import requests
-import pandas as pd
-from llama_index.experimental.query_engine import PandasQueryEngine
 from llama_index.core.memory.types import BaseMemory
 
-
-whisper_device = "cuda" if torch.cuda.is_available() else "cpu"
-print(f"🔄 Loading Whisper model on {whisper_device}...")
-whisper_processor = WhisperProcessor.from_pretrained("openai/whisper-small")
-whisper_model = WhisperForConditionalGeneration.from_pretrained("openai/whisper-small").to(whisper_device)
-print("✅ Whisper model loaded.")
-
-
-
-
-# 1) Fetch & normalize your ThingSpeak data
-THINGSPEAK_URL = (
-    "https://api.thingspeak.com/channels/2974588/feeds.json?results=100"
-)
-
-def fetch_lahn_sensors_df() -> pd.DataFrame:
-    print('Fetching Lahn sensor data...')
-    resp = requests.get(THINGSPEAK_URL)
-    resp.raise_for_status()
-    data = resp.json()
-    # extract channel metadata → used for human‐friendly column names
-    channel_meta = data["channel"]
-    field_map = {
-        f"field{i}": channel_meta[f"field{i}"]
-        for i in range(1, 7)
-    }
-    # load feeds into DataFrame
-    df = pd.json_normalize(data["feeds"])
-    # rename columns to pH, DO (mg/L), etc.
-    df = df.rename(columns=field_map)
-    # parse timestamp & convert all sensor readings to numeric
-    df["created_at"] = pd.to_datetime(df["created_at"])
-    for col in field_map.values():
-        df[col] = pd.to_numeric(df[col], errors="coerce")
-    return df
-
-# 2) Wrap it in a callable that runs PandasQueryEngine on demand
-class LahnSensorsTool:
-    name = "lahn_sensors"
-    description = (
-        "You can access your (the Lahn river's) temperature, CO3 and other live readings here. **Always use this tool for any question about historical, recent or current sensor data.**\n"
-        "This is the single source of truth for live river readings (pH, DO, Temp, EC, Humidity, CO₂).\n"
-        "Some questions require analysis of the data. For example: What was the lowest temperature reading last week?"
-        "Such questions require you to not just access the relevant data range, but perform a computation on it. Do what is neccessary on the data, to obtain a response to the question."
-        "Input: a natural-language question about live Lahn Atlas sensor values.\n"
-        "Output: a concise natural-language answer based on the fetched data and an analysis of it."
-        "Use this to answer analytical questions about the live Lahn Atlas sensor data "
-        "(pH, DO, Temp, EC, Humidity, CO2) fetched from the ThingSpeak REST API."
-    )
-
-    def __init__(self, llm):
-        # store whichever LLM you pass in (e.g. get_llm("mistral-large-instruct"))
-        self.llm = llm
-
-    def __call__(self, query: str) -> str:
-        print('Calling Lahn Sensors Tool...')
-        # fetch fresh data
-        df = fetch_lahn_sensors_df()
-        # spin up a Pandas‐powered engine on it
-        engine = PandasQueryEngine(
-            df=df,
-            llm=self.llm,             # or your preferred LLM wrapper
-            verbose=True,             # shows generated pandas code
-            synthesize_response=True, # narrative answer
-        )
-        # run the query & return the natural‐language result
-        result = engine.query(query)
-        return result.response
-
-    def query(self, query_str: str) -> str:
-        """
-        Alias so that QueryEngineTool can call .query(...)
-        under the hood. Simply forwards to __call__.
-        """
-        return self(query_str)
+from .sensors import THINGSPEAK_URL, fetch_lahn_sensors_df, sensor_cache, LahnSensorsTool
+from .transcription import get_transcriber, whisper_device
+from .audio import decode_audio, to_pcm16, TARGET_SR
+from .realtime_pool import RealtimeSessionPool
+from .prompt_store import system_prompt_store
 
 
 class NoMemory(BaseMemory):
@@ -164,25 +88,10 @@ def format_history_as_string(history):
     return result
 
 
-def convert_to_wav(input_path, output_path):
-    command = [
-        "ffmpeg", "-y", "-i", input_path,
-        "-ar", "16000", "-ac", "1", output_path
-    ]
-    subprocess.run(command, check=True)
-
-    
-def transcribe_audio(file_path):
-    temp_wav_path = file_path.rsplit(".", 1)[0] + "_converted.wav"
-    convert_to_wav(file_path, temp_wav_path)
-
-    speech, sr = torchaudio.load(temp_wav_path)
-    input_features = whisper_processor(
-        speech.squeeze(), sampling_rate=sr, return_tensors="pt"
-    ).input_features.to(whisper_device)
-
-    predicted_ids = whisper_model.generate(input_features)
-    transcription = whisper_processor.batch_decode(predicted_ids, skip_special_tokens=True)[0]
+def transcribe_audio(audio):
+    # audio: uploaded bytes, a file-like object or a path; decoded in memory at 16 kHz
+    speech = decode_audio(audio, TARGET_SR)
+    transcription = get_transcriber().transcribe(speech, TARGET_SR)
     return transcription
 
 
@@ -200,48 +109,28 @@ DEPLOYMENT_ID = "gpt-4o-mini-realtime-preview"
 # Audio settings
 INPUT_FORMAT = 'pcm16'
 OUTPUT_SAMPLERATE = 24000  # Hz for playback/writing WAV
-TARGET_SR = 16000  
 
-async def azure_speech_response_func(input_path: str) -> tuple[str, bytes]:
-    wav_file = input_path.split('.')[0] + ".wav"
+def load_realtime_system_prompt():
+    return system_prompt_store.get().text
 
-    # print('Input path: ', input_path, 'Output path: ', wav_file)
 
-    subprocess.run([
-        "ffmpeg", "-y", "-i", input_path,
-        "-ar", str(TARGET_SR), "-ac", "1", "-f", "wav", wav_file
-    ], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-
-    # 1) Read and encode input audio
-    data, sr = sf.read(wav_file, dtype='int16')
-    os.remove(wav_file)
-    audio_b64 = base64.b64encode(data.tobytes()).decode()
-
-    # 2) Setup Azure client and connect
+async def open_realtime_session(**session_overrides):
+    """Connects to the realtime deployment and waits until the session is configured."""
     client = AsyncAzureOpenAI(
         azure_endpoint=AZURE_ENDPOINT,
         api_key=AZURE_KEY,
         api_version=API_VERSION,
     )
-
-	# Get the directory where the current script is located
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    # print('Base directory: ', base_dir)
-
-	# Build a path to the target file
-    file_path = os.path.join(base_dir, 'system_prompt.txt')
-
-    system_prompt = open(file_path, 'r').read()
-    # print('System prompt: ', system_prompt[:50])
-
-    async with client.beta.realtime.connect(model=DEPLOYMENT_ID) as conn:
+    conn = await client.beta.realtime.connect(model=DEPLOYMENT_ID).enter()
+    try:
         # Session update
         await conn.session.update(session={
             "modalities": ["text", "audio"],
-            "instructions": system_prompt,
+            "instructions": load_realtime_system_prompt(),
             "voice": "alloy",
             "input_audio_format": INPUT_FORMAT,
-            "output_audio_format": INPUT_FORMAT
+            "output_audio_format": INPUT_FORMAT,
+            **session_overrides,
         })
         # wait for session.updated
         async for ev in conn:
@@ -249,6 +138,29 @@ async def azure_speech_response_func(input_path: str) -> tuple[str, bytes]:
                 break
             if ev.type == "error":
                 raise RuntimeError(f"Session error: {ev.model_dump()}")
+    except BaseException:
+        await conn.close()
+        raise
+    return conn
+
+
+# Pre-warmed realtime sessions on a long-running loop, shared by all voice turns
+realtime_pool = RealtimeSessionPool(open_realtime_session)
+
+
+async def azure_speech_stream(audio):
+    """
+    Sends one recorded utterance to the realtime model and yields the reply as
+    it is generated: ("text", str) for transcript deltas and ("audio", bytes)
+    for raw PCM16 chunks at OUTPUT_SAMPLERATE. Runs on realtime_pool.loop.
+    """
+    # 1) Decode (in memory) and encode input audio
+    data = to_pcm16(await asyncio.to_thread(decode_audio, audio, TARGET_SR))
+    audio_b64 = base64.b64encode(data.tobytes()).decode()
+
+    # 2) Take a warm, configured session
+    async with realtime_pool.session() as session:
+        conn = session.conn
 
         # Send user audio
         await conn.conversation.item.create(item={
@@ -261,26 +173,44 @@ async def azure_speech_response_func(input_path: str) -> tuple[str, bytes]:
             # print('Creating conversation item for user message...')
             if ev.type == "conversation.item.created":
                 # print('Created conversation item for user message.')
+                session.track(ev.item.id)
                 break
 
         # Request response
         await conn.response.create(response={"modalities": ["text", "audio"]})
 
-        # Stream back text + collect audio
-        text_parts = []
-        audio_buf = bytearray()
+        # Stream back text + audio deltas as they arrive
         async for ev in conn:
-            if ev.type == "response.text.delta":
-                text_parts.append(ev.delta)
+            if ev.type in ("response.text.delta", "response.audio_transcript.delta"):
+                yield "text", ev.delta
             elif ev.type == "response.audio.delta":
-                audio_buf.extend(base64.b64decode(ev.delta))
+                yield "audio", base64.b64decode(ev.delta)
+            elif ev.type == "response.output_item.added":
+                session.track(ev.item.id)
+            elif ev.type == "error":
+                raise RuntimeError(f"Response error: {ev.model_dump()}")
             elif ev.type == "response.done":
                 break
 
-    # Prepare return values
-    reply_text = "".join(text_parts)
+
+def pcm16_to_wav(pcm: bytes, samplerate=OUTPUT_SAMPLERATE) -> bytes:
     # Convert raw PCM bytes to WAV bytes
-    audio_np = np.frombuffer(audio_buf, dtype='int16')
+    audio_np = np.frombuffer(pcm, dtype='int16')
     bio = io.BytesIO()
-    sf.write(bio, audio_np, OUTPUT_SAMPLERATE, format='WAV', subtype='PCM_16')
-    return reply_text, bio.getvalue()
+    sf.write(bio, audio_np, samplerate, format='WAV', subtype='PCM_16')
+    return bio.getvalue()
+
+
+async def azure_speech_response_func(audio) -> tuple[str, bytes]:
+    # Collect the whole reply (text + WAV) from azure_speech_stream
+    text_parts = []
+    audio_buf = bytearray()
+    async for kind, delta in azure_speech_stream(audio):
+        if kind == "text":
+            text_parts.append(delta)
+        else:
+            audio_buf.extend(delta)
+
+    # Prepare return values
+    reply_text = "".join(text_parts)
+    return reply_text, pcm16_to_wav(bytes(audio_buf))
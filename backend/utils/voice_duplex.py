@@ -0,0 +1,111 @@
+import asyncio, base64, json, os, time
+
+from .utils import open_realtime_session, OUTPUT_SAMPLERATE
+
+
+# Server-side voice activity detection: the realtime model commits the turn
+# (and starts answering) once the visitor has been silent this long
+REALTIME_VAD_THRESHOLD = float(os.getenv("REALTIME_VAD_THRESHOLD", "0.5"))
+REALTIME_VAD_PREFIX_MS = int(os.getenv("REALTIME_VAD_PREFIX_MS", "300"))
+REALTIME_VAD_SILENCE_MS = int(os.getenv("REALTIME_VAD_SILENCE_MS", "400"))
+
+DUPLEX_SESSION = {
+    "turn_detection": {
+        "type": "server_vad",
+        "threshold": REALTIME_VAD_THRESHOLD,
+        "prefix_padding_ms": REALTIME_VAD_PREFIX_MS,
+        "silence_duration_ms": REALTIME_VAD_SILENCE_MS,
+    },
+    "input_audio_transcription": {"model": "whisper-1"},
+}
+
+
+class DuplexVoiceSession:
+    """
+    Relays one continuous voice conversation between a browser WebSocket and
+    a realtime connection with server VAD.
+
+    Browser → server: binary frames of PCM16 mono microphone audio at
+    OUTPUT_SAMPLERATE (24 kHz), or {"type": "stop"}.
+    Server → browser: binary frames of PCM16 reply audio (24 kHz) and JSON:
+        {"type": "speech_started"}                visitor started talking: stop playback (barge-in)
+        {"type": "transcript", "text"}            what the visitor said
+        {"type": "delta", "text"}                 reply transcript as it is generated
+        {"type": "done", "reply"}                 reply finished
+        {"type": "error", "error"}
+
+    receive() and send(data) are the WebSocket's coroutines.
+    """
+
+    def __init__(self, receive, send):
+        self.receive = receive
+        self.send = send
+        self.conn = None
+        self.responding = False
+        self.reply_item = None        # assistant item currently being spoken
+        self.reply_started = None     # when its first audio delta went out
+        self.reply_audio_ms = 0       # how much of it was sent
+
+    async def run(self):
+        self.conn = await open_realtime_session(**DUPLEX_SESSION)
+        print("🎙️ Duplex voice session started.")
+        tasks = [asyncio.create_task(self._pump_microphone()), asyncio.create_task(self._pump_replies())]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await self.conn.close()
+            print("🎙️ Duplex voice session closed.")
+
+    async def _pump_microphone(self):
+        while True:
+            message = await self.receive()
+            if isinstance(message, bytes):
+                await self.conn.input_audio_buffer.append(audio=base64.b64encode(message).decode())
+            elif json.loads(message).get("type") == "stop":
+                return
+
+    async def _barge_in(self):
+        # Stop the reply the visitor is talking over, and cut the conversation
+        # item to what was actually played so the model knows where it was interrupted
+        await self.send(json.dumps({"type": "speech_started"}))
+        if self.responding:
+            await self.conn.response.cancel()
+        if self.reply_item is not None and self.reply_started is not None:
+            played_ms = int(1000 * (time.monotonic() - self.reply_started))
+            await self.conn.conversation.item.truncate(
+                item_id=self.reply_item, content_index=0, audio_end_ms=min(played_ms, self.reply_audio_ms)
+            )
+        self.reply_item = self.reply_started = None
+
+    async def _pump_replies(self):
+        text_parts = []
+        async for ev in self.conn:
+            if ev.type == "input_audio_buffer.speech_started":
+                await self._barge_in()
+            elif ev.type == "conversation.item.input_audio_transcription.completed":
+                await self.send(json.dumps({"type": "transcript", "text": ev.transcript}))
+            elif ev.type == "response.created":
+                self.responding = True
+                text_parts = []
+            elif ev.type == "response.output_item.added":
+                self.reply_item, self.reply_started, self.reply_audio_ms = ev.item.id, None, 0
+            elif ev.type == "response.audio.delta":
+                pcm = base64.b64decode(ev.delta)
+                if self.reply_started is None:
+                    self.reply_started = time.monotonic()
+                self.reply_audio_ms += 1000 * len(pcm) // (2 * OUTPUT_SAMPLERATE)
+                await self.send(pcm)
+            elif ev.type in ("response.text.delta", "response.audio_transcript.delta"):
+                text_parts.append(ev.delta)
+                await self.send(json.dumps({"type": "delta", "text": ev.delta}))
+            elif ev.type == "response.done":
+                self.responding = False
+                await self.send(json.dumps({"type": "done", "reply": "".join(text_parts)}))
+            elif ev.type == "error":
+                # e.g. cancelling a response that had just finished; not fatal
+                print("⚠️ Realtime error:", ev.error.message)
+                await self.send(json.dumps({"type": "error", "error": ev.error.message}))
@@ -19,28 +19,81 @@ export default function LahnAvatarChat() {
   const [selectedTopic, setSelectedTopic] = useState("");
   const [debateSummary, setDebateSummary] = useState(`Lahn:\nPro:\nCon:\n\nYou:\nPro:\nCon:`);
   const [hasFetchedDebateInit, setHasFetchedDebateInit] = useState(false);
+  const [debateReplies, setDebateReplies] = useState(0);
   const chatEndRef = useRef(null);
   const initialFetchRef = useRef(false);
+  // The conversation lives on the server; we only send its id and the new message
+  const sessionIdsRef = useRef({ default: null, debate: null });
+  const summaryRequestRef = useRef(0);
 
   const messages = isDebateMode ? debateMessages : defaultMessages;
   const setMessages = isDebateMode ? setDebateMessages : setDefaultMessages;
   const isThinking = isDebateMode ? debateThinking : defaultThinking;
   const setIsThinking = isDebateMode ? setDebateThinking : setDefaultThinking;
 
-  const fetchMessage = async (payload) => {
-    console.log("fetchMessage called with prompt:", payload.prompt, "history:", payload.history);
+  const fetchMessage = async (prompt) => {
+    console.log("fetchMessage called with prompt:", prompt);
+    const mode = isDebateMode ? "debate" : "default";
     setIsThinking(true);
     try {
-      const resp = await fetch(
-        "https://lahn-server.eastus.cloudapp.azure.com:5001/api/chat",
+      const post = (body) => fetch(
+        "https://lahn-server.eastus.cloudapp.azure.com:5001/api/chat-stream",
         {
           method: "POST",
           headers: { "Content-Type": "application/json" },
-          body: JSON.stringify(payload),
+          body: JSON.stringify(body),
         }
       );
-      const { reply } = await resp.json();
-      setMessages(prev => [...prev, { sender: "avatar", text: reply }]);
+      let resp = await post({ prompt, session_id: sessionIdsRef.current[mode] });
+      if (resp.status === 410) {
+        // The server no longer knows our session: start a new one from the messages we still have
+        sessionIdsRef.current[mode] = null;
+        resp = await post({ prompt, history: messages, resume: true });
+      }
+      if (!resp.ok) throw new Error(`Chat request failed with status ${resp.status}`);
+
+      // Read the Server-Sent Events and grow the avatar message as tokens arrive
+      const reader = resp.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      let text = "";
+      let started = false;
+      const showText = (value) => {
+        if (!started) {
+          started = true;
+          setIsThinking(false);
+          setMessages(prev => [...prev, { sender: "avatar", text: value }]);
+        } else {
+          setMessages(prev => [...prev.slice(0, -1), { sender: "avatar", text: value }]);
+        }
+      };
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split("\n\n");
+        buffer = events.pop();
+        for (const raw of events) {
+          let event = "message";
+          let data = "";
+          for (const line of raw.split("\n")) {
+            if (line.startsWith("event: ")) event = line.slice(7);
+            else if (line.startsWith("data: ")) data += line.slice(6);
+          }
+          const parsed = data ? JSON.parse(data) : {};
+          if (event === "reset") {
+            text = "";
+          } else if (event === "done") {
+            text = parsed.reply;
+            if (parsed.session_id) sessionIdsRef.current[mode] = parsed.session_id;
+            if (mode === "debate") setDebateReplies((n) => n + 1);
+          } else if (parsed.delta) {
+            text += parsed.delta;
+          }
+          if (started || text) showText(text);
+        }
+      }
     } catch (error) {
       console.error(error);
     } finally {
@@ -51,7 +104,7 @@ export default function LahnAvatarChat() {
   useEffect(() => {
     if (!isDebateMode && !initialFetchRef.current) {
       initialFetchRef.current = true;
-      fetchMessage({ prompt: "__INIT__" });
+      fetchMessage("__INIT__");
     }
   }, [isDebateMode]);
 
@@ -59,13 +112,16 @@ export default function LahnAvatarChat() {
     if (isDebateMode && selectedTopic && !hasFetchedDebateInit) {
       setHasFetchedDebateInit(true);
       setDebateMessages([]);
-      fetchMessage({ history: debateMessages, prompt: `Let's talk about ${selectedTopic}` });
+      sessionIdsRef.current.debate = null;
+      fetchMessage(`Let's talk about ${selectedTopic}`);
     }
   }, [isDebateMode, selectedTopic]);
 
+  // Update the summary once each debate reply is complete (SSE "done"), not on every streamed delta.
+  // Only the newest request may set the summary, so a slow older response can't overwrite it.
   useEffect(() => {
-    const last = debateMessages[debateMessages.length - 1];
-    if (isDebateMode && selectedTopic && last?.sender === 'avatar') {
+    if (isDebateMode && selectedTopic && debateReplies > 0) {
+      const requestId = ++summaryRequestRef.current;
       (async () => {
         try {
           const resp = await fetch(
@@ -73,17 +129,18 @@ export default function LahnAvatarChat() {
             {
               method: "POST",
               headers: { "Content-Type": "application/json" },
-              body: JSON.stringify({ history: debateMessages, topic: selectedTopic, summary: debateSummary }),
+              body: JSON.stringify({ session_id: sessionIdsRef.current.debate, topic: selectedTopic, summary: debateSummary }),
             }
           );
+          if (!resp.ok) throw new Error(`Summary request failed with status ${resp.status}`);
           const { summary } = await resp.json();
-          setDebateSummary(summary);
+          if (requestId === summaryRequestRef.current) setDebateSummary(summary);
         } catch (error) {
           console.error(error);
         }
       })();
     }
-  }, [debateMessages]);
+  }, [debateReplies]);
 
   const handleRefreshPrompt = async () => {
     setRefreshPromptState("loading");
@@ -110,11 +167,10 @@ export default function LahnAvatarChat() {
   const handleSubmit = async () => {
     if (!input.trim()) return;
     const userInput = input;
-    const updated = [...messages, { sender: "user", text: userInput }];
-    setMessages(updated);
+    setMessages([...messages, { sender: "user", text: userInput }]);
     setInput("");
     setIsThinking(true);
-    await fetchMessage({ history: updated, prompt: userInput });
+    await fetchMessage(userInput);
   };
 
   useEffect(() => {
@@ -0,0 +1,129 @@
+import React, { useState, useRef, useEffect } from "react";
+import { Button } from "@/components/ui/button";
+import { Mic, StopCircle } from "lucide-react";
+
+// Continuous voice conversation over /api/voice-duplex (server_async.py only).
+// The microphone is streamed as 24 kHz PCM16; the server detects turns and
+// streams the reply back. Talking over the reply interrupts it (barge-in).
+const SAMPLE_RATE = 24000;
+
+export default function DuplexVoiceChat() {
+  const [active, setActive] = useState(false);
+  const [heard, setHeard] = useState("");
+  const [reply, setReply] = useState("");
+  const socketRef = useRef(null);
+  const audioCtxRef = useRef(null);
+  const streamRef = useRef(null);
+  const processorRef = useRef(null);
+  const playheadRef = useRef(0);
+  const sourcesRef = useRef([]);
+
+  useEffect(() => () => stop(), []);
+
+  const playChunk = (arrayBuffer) => {
+    const ctx = audioCtxRef.current;
+    const pcm = new Int16Array(arrayBuffer);
+    const buffer = ctx.createBuffer(1, pcm.length, SAMPLE_RATE);
+    const channel = buffer.getChannelData(0);
+    for (let i = 0; i < pcm.length; i++) channel[i] = pcm[i] / 32768;
+    const source = ctx.createBufferSource();
+    source.buffer = buffer;
+    source.connect(ctx.destination);
+    playheadRef.current = Math.max(playheadRef.current, ctx.currentTime);
+    source.start(playheadRef.current);
+    playheadRef.current += buffer.duration;
+    sourcesRef.current.push(source);
+    source.onended = () => {
+      sourcesRef.current = sourcesRef.current.filter((s) => s !== source);
+    };
+  };
+
+  const stopPlayback = () => {
+    sourcesRef.current.forEach((s) => s.stop());
+    sourcesRef.current = [];
+    playheadRef.current = 0;
+  };
+
+  const start = async () => {
+    setHeard("");
+    setReply("");
+    const stream = await navigator.mediaDevices.getUserMedia({ audio: { echoCancellation: true } });
+    streamRef.current = stream;
+    const ctx = new (window.AudioContext || window.webkitAudioContext)({ sampleRate: SAMPLE_RATE });
+    audioCtxRef.current = ctx;
+
+    const socket = new WebSocket("wss://lahn-server.eastus.cloudapp.azure.com:5001/api/voice-duplex");
+    socket.binaryType = "arraybuffer";
+    socketRef.current = socket;
+
+    socket.onmessage = (e) => {
+      if (e.data instanceof ArrayBuffer) {
+        playChunk(e.data);
+        return;
+      }
+      const msg = JSON.parse(e.data);
+      if (msg.type === "speech_started") {
+        stopPlayback();
+      } else if (msg.type === "transcript") {
+        setHeard(msg.text);
+        setReply("");
+      } else if (msg.type === "delta") {
+        setReply((prev) => prev + msg.text);
+      } else if (msg.type === "done") {
+        if (msg.reply) setReply(msg.reply);
+      } else if (msg.type === "error") {
+        console.error("Voice chat error:", msg.error);
+      }
+    };
+    socket.onclose = () => stop();
+
+    // Stream microphone frames as PCM16 while the socket is open
+    const source = ctx.createMediaStreamSource(stream);
+    const processor = ctx.createScriptProcessor(2048, 1, 1);
+    processorRef.current = processor;
+    processor.onaudioprocess = (e) => {
+      if (socket.readyState !== WebSocket.OPEN) return;
+      const input = e.inputBuffer.getChannelData(0);
+      const pcm = new Int16Array(input.length);
+      for (let i = 0; i < input.length; i++) {
+        pcm[i] = Math.max(-1, Math.min(1, input[i])) * 32767;
+      }
+      socket.send(pcm.buffer);
+    };
+    source.connect(processor);
+    processor.connect(ctx.destination);
+    setActive(true);
+  };
+
+  const stop = () => {
+    const socket = socketRef.current;
+    if (socket && socket.readyState === WebSocket.OPEN) {
+      socket.send(JSON.stringify({ type: "stop" }));
+      socket.close();
+    }
+    socketRef.current = null;
+    processorRef.current?.disconnect();
+    streamRef.current?.getTracks().forEach((t) => t.stop());
+    if (audioCtxRef.current && audioCtxRef.current.state !== "closed") audioCtxRef.current.close();
+    sourcesRef.current = [];
+    setActive(false);
+  };
+
+  return (
+    <div className="max-w-xl mx-auto py-10 px-4 text-center space-y-6">
+      <h2 className="text-2xl font-semibold">🎙️ Talk with the Lahn</h2>
+
+      <Button
+        onClick={active ? stop : start}
+        variant={active ? "destructive" : "primary"}
+        className="flex items-center justify-center space-x-2 w-40 mx-auto"
+      >
+        {active ? <StopCircle /> : <Mic />}
+        <span>{active ? "End conversation" : "Start talking"}</span>
+      </Button>
+
+      {heard && <p className="text-sm text-stone-500">“{heard}”</p>}
+      <p className="mt-4 text-muted-foreground">{reply}</p>
+    </div>
+  );
+}
@@ -12,6 +12,7 @@ export default function VoiceChat() {
   const analyserRef = useRef(null);
   const dataArrayRef = useRef(null);
   const audioCtxRef = useRef(null);
+  const playbackCtxRef = useRef(null);
 
   // Initialize canvas drawing context
   useEffect(() => {
@@ -20,6 +21,16 @@ export default function VoiceChat() {
     ctx.clearRect(0, 0, canvas.width, canvas.height);
   }, []);
 
+  // One playback context for all replies, closed when the component goes away
+  useEffect(() => () => playbackCtxRef.current?.close(), []);
+
+  const getPlaybackCtx = () => {
+    if (!playbackCtxRef.current || playbackCtxRef.current.state === "closed") {
+      playbackCtxRef.current = new (window.AudioContext || window.webkitAudioContext)();
+    }
+    return playbackCtxRef.current;
+  };
+
   // Draw waveform continuously
   const drawWave = () => {
     const canvas = canvasRef.current;
@@ -102,31 +113,56 @@ export default function VoiceChat() {
         formData.append("audio", audioBlob, "recording.webm");
 
         try {
-          const res = await fetch("https://lahn-server.eastus.cloudapp.azure.com:5001/api/voice-chat", { method: "POST", body: formData });
-          const data = await res.json();
-          setReply(data.reply_text || "(No text response)");
-
-          if (data.reply_audio_url) {
-            const audio = new Audio(data.reply_audio_url);
-            await audio.play();
-
-            // const ctx = new (window.AudioContext || window.webkitAudioContext)();
-            // audioCtxRef.current = ctx;
-            // const source = ctx.createMediaElementSource(audio);
-            // const analyser = ctx.createAnalyser();
-            // analyser.fftSize = 2048;
-            // source.connect(analyser);
-            // analyser.connect(ctx.destination);
-            // analyserRef.current = analyser;
-
-            // const bufferLength = analyser.frequencyBinCount;
-            // dataArrayRef.current = new Uint8Array(bufferLength);
-            // drawWave();
-
-            // audio.onended = () => {
-            //   cancelAnimationFrame(animationRef.current);
-            //   ctx.close();
-            // };
+          const res = await fetch("https://lahn-server.eastus.cloudapp.azure.com:5001/api/voice-chat-stream", { method: "POST", body: formData });
+          if (!res.ok) throw new Error(`Voice chat request failed with status ${res.status}`);
+
+          // Play PCM16 chunks back-to-back as they arrive, show the transcript as it grows
+          const playbackCtx = getPlaybackCtx();
+          let playhead = playbackCtx.currentTime;
+          const playChunk = (b64, sampleRate) => {
+            const bytes = Uint8Array.from(atob(b64), (c) => c.charCodeAt(0));
+            const pcm = new Int16Array(bytes.buffer, 0, Math.floor(bytes.length / 2));
+            const buffer = playbackCtx.createBuffer(1, pcm.length, sampleRate);
+            const channel = buffer.getChannelData(0);
+            for (let i = 0; i < pcm.length; i++) channel[i] = pcm[i] / 32768;
+            const source = playbackCtx.createBufferSource();
+            source.buffer = buffer;
+            source.connect(playbackCtx.destination);
+            playhead = Math.max(playhead, playbackCtx.currentTime);
+            source.start(playhead);
+            playhead += buffer.duration;
+          };
+
+          const reader = res.body.getReader();
+          const decoder = new TextDecoder();
+          let buffer = "";
+          let text = "";
+          while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            const events = buffer.split("\n\n");
+            buffer = events.pop();
+            for (const raw of events) {
+              let event = "message";
+              let data = "";
+              for (const line of raw.split("\n")) {
+                if (line.startsWith("event: ")) event = line.slice(7);
+                else if (line.startsWith("data: ")) data += line.slice(6);
+              }
+              const parsed = data ? JSON.parse(data) : {};
+              if (event === "audio") {
+                playChunk(parsed.audio, parsed.sample_rate);
+              } else if (event === "error") {
+                throw new Error(parsed.error);
+              } else if (event === "done") {
+                text = parsed.reply;
+                setReply(text || "(No text response)");
+              } else if (parsed.delta) {
+                text += parsed.delta;
+                setReply(text);
+              }
+            }
           }
 
           resolve();